@@ -0,0 +1,49 @@
+import argparse
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from compiler.AST.base import SPL
+from compiler.lexer import Lexer
+from compiler.parser import Parser, TokenReader
+from compiler.utils import InputHandler
+
+# Measures the memory held by the SPLFile tree of a program scaled up, reported as bytes per node
+
+seed_program = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'test_programs', 'expressions.spl')
+
+
+def count_nodes(root: SPL):
+    count, stack = 0, [root]
+    while stack:
+        node = stack.pop()
+        count += 1
+        attrs = [getattr(node, a) for c in type(node).__mro__ for a in getattr(c, '__slots__', ())
+                 if hasattr(node, a)] + list(getattr(node, '__dict__', {}).values())
+        for value in attrs:
+            for child in (value if isinstance(value, list) else [value]):
+                if isinstance(child, SPL):
+                    stack.append(child)
+    return count
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-i', '--input', type=str, default=seed_program, help='SPL program to scale up')
+parser.add_argument('-s', '--scale', type=int, default=1000, help='Number of copies of the program')
+args = parser.parse_args()
+
+InputHandler.set_input_text(open(args.input, 'r').read() * args.scale)
+tokens = Lexer(max_errors=sys.maxsize).lex_input()
+tracemalloc.start()
+before, _ = tracemalloc.get_traced_memory()
+ast = Parser(TokenReader(tokens)).parse_spl()
+after, peak = tracemalloc.get_traced_memory()
+tracemalloc.stop()
+nodes = count_nodes(ast)
+
+print(f'tokens:         {len(tokens)}')
+print(f'nodes:          {nodes}')
+print(f'AST memory:     {after - before} bytes')
+print(f'bytes per node: {(after - before) / nodes:.1f}')
@@ -0,0 +1,60 @@
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from compiler.lexer import Lexer
+from compiler.utils import InputHandler
+
+# Compares peak RSS of lexing a large SPL file read into a str against lexing the memory-mapped file.
+# Every measurement runs in its own process, tokens are streamed and dropped so only the input is measured
+
+seed_program = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'test_programs', 'expressions.spl')
+
+
+def parse_size(size: str):
+    units = {'K': 1024, 'M': 1024 * 1024}
+    if size[-1].upper() in units:
+        return int(size[:-1]) * units[size[-1].upper()]
+    return int(size)
+
+
+def generate_file(path: str, size: int):
+    seed = open(seed_program, 'r').read()
+    with open(path, 'w') as f:
+        for i in range(size // len(seed)):
+            f.write(seed)
+
+
+def lex_file(path: str, mode: str):
+    if mode == 'mmap':
+        InputHandler.set_input_file(path)
+    else:
+        InputHandler.set_input_text(open(path, 'r').read())
+    num_tokens = 0
+    for _ in Lexer(max_errors=sys.maxsize).iter_tokens():
+        num_tokens += 1
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KB on Linux
+    print(f'{mode:>6} {num_tokens:>12} {peak_rss / 1024:>14.1f}')
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-s', '--size', type=str, default='50M', help='Input file size, e.g. 50M or 500M')
+parser.add_argument('--lex', type=str, nargs=2, help=argparse.SUPPRESS)  # Used internally: path and mode
+args = parser.parse_args()
+
+if args.lex:
+    lex_file(*args.lex)
+else:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'input.spl')
+        generate_file(path, parse_size(args.size))
+        print(f'input file size: {os.path.getsize(path) / (1024 * 1024):.1f} MB')
+        print(f'{"mode":>6} {"tokens":>12} {"peak RSS (MB)":>14}')
+        for mode in ['read', 'mmap']:
+            sys.stdout.flush()
+            subprocess.run([sys.executable, os.path.abspath(__file__), '--lex', path, mode])
@@ -0,0 +1,49 @@
+import argparse
+import glob
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from compiler.code_generation.SSM.SSMGenerator import SSMGenerator
+from compiler.code_generation.generic.GenericGenerator import GenericGenerator
+from compiler.code_generation.x64.X64Generator import X64Generator
+from compiler.front_end import FrontEnd, builtin_functions
+
+# Number of function instances and size of the SSM and x86_64 code of the test programs, without and with sharing the
+# instances that only differ in types their code doesn't depend on (see type_erasure). Sizes are in instructions
+
+test_programs = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'test_programs')
+
+
+def code_sizes(path: str, share_instances: bool):  # None if the program doesn't compile
+    try:
+        if (typed := FrontEnd(builtins := builtin_functions()).run(open(path, 'r').read())) is None:
+            return None
+        ast, env = typed
+        functions = GenericGenerator(ast, env, builtins, share_instances).generate()
+        ssm = sum(len(ops) for ops in SSMGenerator(functions).generate())
+        x64 = X64Generator(functions)
+        x64.generate_x64_instructions()
+    except Exception:
+        return None
+    return len(functions), ssm, sum(len(insts) for insts in x64.x64_code.values())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-i', '--input', type=str, nargs='+', help='SPL programs, all test programs by default')
+    args = parser.parse_args()
+    paths = args.input or sorted(p for p in glob.glob(os.path.join(test_programs, '**', '*.spl'), recursive=True)
+                                 if os.sep + 'errors' + os.sep not in p)
+
+    print(f'{"program":<44}{"instances":>16}{"SSM":>16}{"x86_64":>16}')
+    totals = [0] * 6
+    for path in paths:
+        if (before := code_sizes(path, False)) is None or (after := code_sizes(path, True)) is None:
+            print(f'{os.path.basename(path):<44}{"does not compile":>16}')
+            continue
+        sizes = [x for pair in zip(before, after) for x in pair]
+        totals = [t + x for t, x in zip(totals, sizes)]
+        print(f'{os.path.basename(path):<44}' + ''.join(f'{f"{b} -> {a}":>16}' for b, a in zip(before, after)))
+    print(f'{"total":<44}' + ''.join(f'{f"{b} -> {a}":>16}' for b, a in zip(totals[::2], totals[1::2])))
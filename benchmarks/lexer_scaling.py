@@ -0,0 +1,45 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from compiler.lexer import Lexer
+from compiler.utils import InputHandler
+
+# Generates SPL sources of increasing size and lexes them, time per KB should stay constant if lexing is linear
+
+default_sizes = ['10K', '100K', '1M', '10M', '50M']
+seed_program = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'test_programs', 'expressions.spl')
+
+
+def parse_size(size: str):
+    units = {'K': 1024, 'M': 1024 * 1024}
+    if size[-1].upper() in units:
+        return int(size[:-1]) * units[size[-1].upper()]
+    return int(size)
+
+
+def generate_input(size: int):
+    seed = open(seed_program, 'r').read()
+    return (seed * (size // len(seed) + 1))[:size]
+
+
+def lex(text: str):
+    InputHandler.set_input_text(text)
+    lexer = Lexer(max_errors=sys.maxsize)
+    start = time.perf_counter()
+    tokens = lexer.lex_input()
+    return time.perf_counter() - start, len(tokens)
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-s', '--sizes', type=str, nargs='+', default=default_sizes, help='Input sizes, e.g. 10K 1M')
+args = parser.parse_args()
+
+print(f'{"size":>10} {"tokens":>10} {"seconds":>10} {"us/KB":>10}')
+for s in args.sizes:
+    size = parse_size(s)
+    seconds, num_tokens = lex(generate_input(size))
+    print(f'{s:>10} {num_tokens:>10} {seconds:>10.3f} {seconds * 1e6 / (size / 1024):>10.1f}')
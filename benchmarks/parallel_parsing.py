@@ -0,0 +1,38 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from compiler.lexer import Lexer
+from compiler.parser import Parser, TokenReader
+from compiler.utils import InputHandler
+
+# Parses a program scaled up to many top level declarations, without and with worker processes
+
+seed_program = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'test_programs', 'expressions.spl')
+
+
+def parse(tokens, jobs: int):
+    p = Parser(TokenReader(tokens))
+    start = time.perf_counter()
+    ast = p.parse_spl() if jobs <= 1 else p.parse_spl_parallel(jobs)
+    return time.perf_counter() - start, len(ast.declarations)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-i', '--input', type=str, default=seed_program, help='SPL program to scale up')
+    parser.add_argument('-s', '--scale', type=int, default=2000, help='Number of copies of the program')
+    parser.add_argument('-j', '--jobs', type=int, nargs='+', default=[1, 2, 4, os.cpu_count()],
+                        help='Numbers of worker processes to compare')
+    args = parser.parse_args()
+
+    InputHandler.set_input_text(open(args.input, 'r').read() * args.scale)
+    tokens = Lexer().lex_input()
+    print(f'tokens: {len(tokens)}, cpus: {os.cpu_count()}')
+    print(f'{"jobs":>6} {"decls":>8} {"seconds":>10}')
+    for jobs in sorted(set(args.jobs)):
+        seconds, decls = parse(tokens, jobs)
+        print(f'{jobs:>6} {decls:>8} {seconds:>10.3f}')
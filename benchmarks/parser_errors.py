@@ -0,0 +1,35 @@
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from compiler.lexer import Lexer
+from compiler.parser import Parser, TokenReader
+from compiler.utils import InputHandler
+
+# Parses the programs with errors scaled up, without aborting after a few errors, so error recovery is timed
+
+error_programs = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'test_programs', 'errors', '*.spl')
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-i', '--input', type=str, nargs='+', default=sorted(glob.glob(error_programs)),
+                    help='SPL programs to scale up')
+parser.add_argument('-s', '--scale', type=int, default=500, help='Number of copies of each program')
+parser.add_argument('-r', '--repeat', type=int, default=3, help='Number of timed runs, the best is reported')
+args = parser.parse_args()
+
+print(f'{"program":<24}{"tokens":>10}{"errors":>10}{"parse time":>14}')
+for path in args.input:
+    InputHandler.set_input_text(open(path, 'r').read() * args.scale)
+    tokens = Lexer(max_errors=sys.maxsize).lex_input()
+    best = None
+    for _ in range(args.repeat):
+        p = Parser(TokenReader(tokens), max_errors=sys.maxsize)
+        start = time.perf_counter()
+        p.parse_spl()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    print(f'{os.path.basename(path):<24}{len(tokens):>10}{len(p.errors):>10}{best:>12.3f} s')
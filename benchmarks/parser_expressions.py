@@ -0,0 +1,34 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from compiler.lexer import Lexer
+from compiler.parser import Parser, TokenReader
+from compiler.utils import InputHandler
+
+# Parses an expression heavy program scaled up, tokens are lexed up front so only parsing is timed
+
+seed_program = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'test_programs', 'expressions.spl')
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-i', '--input', type=str, default=seed_program, help='SPL program to scale up')
+parser.add_argument('-s', '--scale', type=int, default=1000, help='Number of copies of the program')
+parser.add_argument('-r', '--repeat', type=int, default=3, help='Number of timed runs, the best is reported')
+args = parser.parse_args()
+
+InputHandler.set_input_text(open(args.input, 'r').read() * args.scale)
+tokens = Lexer(max_errors=sys.maxsize).lex_input()
+
+best = None
+for _ in range(args.repeat):
+    start = time.perf_counter()
+    Parser(TokenReader(tokens)).parse_spl()
+    seconds = time.perf_counter() - start
+    best = seconds if best is None else min(best, seconds)
+
+print(f'tokens:        {len(tokens)}')
+print(f'parse time:    {best:.3f} s')
+print(f'us per token:  {best * 1e6 / len(tokens):.2f}')
@@ -0,0 +1,53 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from compiler.lexer import EditedTokens, Lexer
+from compiler.utils import InputHandler
+
+# Types a statement into the middle of SPL sources of increasing size, one character per edit, and re-lexes after each
+# edit. The time per edit should stay the same as the input grows, apart from cache effects of editing the text itself
+
+default_sizes = ['10K', '100K', '1M', '10M']
+seed_program = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'test_programs', 'expressions.spl')
+typed_text = 'var typed = 1 : [] ; // comment\n'
+
+
+def parse_size(size: str):
+    units = {'K': 1024, 'M': 1024 * 1024}
+    if size[-1].upper() in units:
+        return int(size[:-1]) * units[size[-1].upper()]
+    return int(size)
+
+
+def generate_input(size: int):
+    seed = open(seed_program, 'r').read()
+    return bytearray((seed * (size // len(seed) + 1)).encode())
+
+
+def type_text(text: bytearray, repeat: int):  # Median seconds per edit
+    InputHandler.set_input_text(text)  # Bytes, as for memory-mapped input, so the text can be edited in place
+    lexer = Lexer(max_errors=sys.maxsize)
+    tokens = EditedTokens(lexer.lex_input())
+    offset = text.index(b'\n', len(text) // 2) + 1
+    times = []
+    for c in typed_text * repeat:
+        text[offset:offset] = c.encode()  # Not timed, an editor has the text already
+        start = time.perf_counter()
+        lexer.relex(tokens, offset, 0, c)
+        times.append(time.perf_counter() - start)
+        offset += 1
+    return statistics.median(times)
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-s', '--sizes', type=str, nargs='+', default=default_sizes, help='Input sizes, e.g. 10K 1M')
+parser.add_argument('-r', '--repeat', type=int, default=5, help='Number of times the statement is typed')
+args = parser.parse_args()
+
+print(f'{"size":>10} {"us/edit":>10}')
+for s in args.sizes:
+    print(f'{s:>10} {type_text(generate_input(parse_size(s)), args.repeat) * 1e6:>10.1f}')
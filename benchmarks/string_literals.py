@@ -0,0 +1,32 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from compiler.code_generation.generic.GenericGenerator import GenericGenerator
+from compiler.front_end import FrontEnd, builtin_functions
+
+# Compiles a program with one large string literal (an embedded text table) up to generic code, time per character
+# should stay constant if string literals are handled in linear time
+
+default_lengths = [1000, 10000, 100000, 1000000]
+
+
+def compile_program(text: str):
+    ast, env = FrontEnd(builtins := builtin_functions()).run(text)
+    return GenericGenerator(ast, env, builtins).generate()
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-l', '--lengths', type=int, nargs='+', default=default_lengths, help='String literal lengths')
+args = parser.parse_args()
+
+print(f'{"length":>10} {"seconds":>10} {"us/char":>10}')
+for length in args.lengths:
+    table = ('abcdefghijklmnopqrstuvwxyz0123456789 ' * (length // 37 + 1))[:length]
+    start = time.perf_counter()
+    compile_program(f'main() :: -> Void {{ var table = "{table}"; println(table); }}\n')
+    seconds = time.perf_counter() - start
+    print(f'{length:>10} {seconds:>10.3f} {seconds * 1e6 / length:>10.2f}')
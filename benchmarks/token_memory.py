@@ -0,0 +1,36 @@
+import argparse
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from compiler.lexer import Lexer
+from compiler.utils import InputHandler
+
+# Measures the memory held by the lexed token list, reported as bytes per token
+
+seed_program = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'test_programs', 'expressions.spl')
+
+
+def generate_input(size: int):
+    seed = open(seed_program, 'r').read()
+    return (seed * (size // len(seed) + 1))[:size]
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-s', '--size', type=int, default=1024 * 1024, help='Input size in bytes')
+args = parser.parse_args()
+
+InputHandler.set_input_text(generate_input(args.size))
+lexer = Lexer(max_errors=sys.maxsize)
+tracemalloc.start()
+before, _ = tracemalloc.get_traced_memory()
+tokens = lexer.lex_input()
+after, peak = tracemalloc.get_traced_memory()
+tracemalloc.stop()
+
+print(f'input size:      {args.size} bytes')
+print(f'tokens:          {len(tokens)}')
+print(f'token memory:    {after - before} bytes')
+print(f'bytes per token: {(after - before) / len(tokens):.1f}')
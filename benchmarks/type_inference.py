@@ -0,0 +1,76 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from compiler.analysis.interface import InterfaceCache
+from compiler.front_end import FrontEnd, builtin_functions
+
+# Type inference of generated programs with many functions, time per function should stay constant if inference
+# scales linearly with the program size. With --tree, function i calls function i // 2 instead of i - 1, so there are
+# many independent functions to infer in parallel. With --incremental, the time is that of inferring the program again
+# with the interface cache of a first compilation, after main was changed
+
+default_sizes = [1000, 10000, 100000]
+
+function_template = '''
+f{i}(x, xs) {{
+    var y = x;
+    var l = y : xs;
+    var p = (l, {i});
+    if (len(l) > p.snd) {{
+        return f{j}(y, l.tl);
+    }}
+    while (!isEmpty(xs)) {{
+        xs = xs.tl;
+        p = (xs, p.snd - 1);
+    }}
+    return p.fst.hd;
+}}
+'''
+
+
+def generate_program(functions: int, tree=False):
+    parts = ['f0(x, xs) { return x; }\n']
+    for i in range(1, functions):
+        parts.append(function_template.format(i=i, j=i // 2 if tree else i - 1))
+    parts.append(f'main() {{ print(f{functions - 1}(1, [])); }}\n')
+    return ''.join(parts)
+
+
+def infer_program(text: str, jobs=1, cache: InterfaceCache = None):
+    front_end = FrontEnd(builtin_functions(), jobs)
+    ast, _ = front_end.parse_text(text)
+    front_end.analyse(ast)
+    start = time.perf_counter()
+    front_end.infer_types(ast, cache)
+    return time.perf_counter() - start
+
+
+def infer_incremental(text: str, jobs=1):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'cache.spli')
+        infer_program(text, jobs, cache := InterfaceCache())
+        cache.save(path)
+        changed = text.replace('main() {', 'main() { print(0);')
+        start = time.perf_counter()
+        cache = InterfaceCache.load(path)
+        return time.perf_counter() - start + infer_program(changed, jobs, cache)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-s', '--sizes', type=int, nargs='+', default=default_sizes, help='Numbers of functions')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='Number of worker processes')
+    parser.add_argument('--tree', action='store_true', help='Call graph is a binary tree instead of a chain')
+    parser.add_argument('--incremental', action='store_true', help='Infer again with the interface cache')
+    args = parser.parse_args()
+
+    print(f'{"functions":>10} {"seconds":>10} {"us/function":>12}')
+    for size in args.sizes:
+        text = generate_program(size, args.tree)
+        seconds = infer_incremental(text, args.jobs) if args.incremental else infer_program(text, args.jobs)
+        print(f'{size:>10} {seconds:>10.3f} {seconds * 1e6 / size:>12.1f}')
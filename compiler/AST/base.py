@@ -1,13 +1,11 @@
 from typing import Dict, List
 
 import compiler.code_generation.generic.generator_utils as gen_utils
-from compiler.analysis.ReturnValueAnalyzable import ReturnValueAnalyzable
-from compiler.analysis.binding import BindingAnalyzable, Context
 from compiler.analysis.typing import TypeInferrable, Env
-from compiler.analysis.unification import InferenceType, Subst
+from compiler.analysis.unification import InferenceType
 from compiler.code_generation.generic.OpCodeBuilder import OpCodeBuilder
-from compiler.compiler_warnings import CompilerWarning
 from compiler.utils import CodeRange
+from compiler.walker import walk
 
 
 def get_indent(i):
@@ -15,60 +13,100 @@ def get_indent(i):
 
 
 # Base class
+# Nodes use __slots__ to keep large trees small, the code range is stored packed in a single int (see CodeRange.pack)
 class SPL:
+    __slots__ = ('span',)
+    # Slots with the nodes below this one in source order, see PassManager. A slot with a list of nodes is the only one
+    child_slots = ()
+
     def __init__(self):
-        self.code_range = None
+        self.span = None
 
     def with_code_range(self, code_range: CodeRange):
-        self.code_range: CodeRange = code_range
+        self.span = None if code_range is None else code_range.pack()
         return self
 
+    @property
+    def code_range(self):
+        return None if self.span is None else CodeRange.unpack(self.span)
+
     def indented_print(self, indent=0):
         return get_indent(indent) + self.pretty_print(indent)
 
     def pretty_print(self, i=0):
-        return self.__str__()
+        out = []
+        walk(self.write(out, i))
+        return ''.join(out)
+
+    def write(self, out: List[str], i=0):  # Appends the printed node to out, nodes with children yield their writes
+        out.append(self.__str__())
+
+    def shift_ids(self, first_id: int, shift: int):  # Adds shift to every variable and type id from first_id on
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            for attr in slot_names(type(node)):
+                value = getattr(node, attr)
+                if isinstance(value, SPL):
+                    stack.append(value)
+                elif isinstance(value, list):
+                    stack.extend(x for x in value if isinstance(x, SPL))
+                if attr == 'id_number' and value is not None and value >= first_id:
+                    node.id_number = value + shift
+                elif attr == 'arg_ids' and value is not None:
+                    node.arg_ids = [x + shift if x >= first_id else x for x in value]
+
+
+node_slots: Dict[type, List[str]] = {}
+
+
+def slot_names(cls: type):  # Slots of a node class including those of its base classes
+    if (names := node_slots.get(cls)) is None:
+        names = node_slots[cls] = [a for c in cls.__mro__ for a in getattr(c, '__slots__', ())]
+    return names
 
 
 class Text(SPL):
+    __slots__ = ('value',)
+
     def __init__(self, value: str):
         super().__init__()
         self.value = value
 
-    def pretty_print(self, i=0):
-        return self.value
+    def write(self, out: List[str], i=0):
+        out.append(self.value)
 
 
 # In case of an error during parsing, this node is used as placeholder
 class Error(SPL):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__()
 
-    def pretty_print(self, i=0):
-        return '{Error!}'
+    def write(self, out: List[str], i=0, arg_ids=None):  # Also stands in for FunArgNames
+        out.append('{Error!}')
 
 
 # Decl base class
-class Decl(SPL, TypeInferrable, BindingAnalyzable):
+class Decl(SPL, TypeInferrable):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__()
 
     def infer_type(self, env: Env, sigma: InferenceType):
-        return Subst.empty()
-
-    def binding_analysis(self, context: Context, feedback: Dict[str, list]):
         pass
 
 
 # Expr base class
-class Expr(SPL, TypeInferrable, BindingAnalyzable, gen_utils.CodeGenerator):
+class Expr(SPL, TypeInferrable, gen_utils.CodeGenerator):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__()
 
     def infer_type(self, env: Env, sigma: InferenceType):
-        return Subst.empty()
-
-    def binding_analysis(self, context: Context, feedback: Dict[str, list]):
         pass
 
     def generate_code(self, code_builder: OpCodeBuilder):
@@ -76,33 +114,28 @@ class Expr(SPL, TypeInferrable, BindingAnalyzable, gen_utils.CodeGenerator):
 
 
 # Statement base class
-class Statement(SPL, TypeInferrable, BindingAnalyzable, ReturnValueAnalyzable, gen_utils.CodeGenerator):
+class Statement(SPL, TypeInferrable, gen_utils.CodeGenerator):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__()
 
-    def binding_analysis(self, context: Context, feedback: Dict[str, list]):
-        pass
-
     def infer_type(self, env: Env, sigma: InferenceType):
-        return Subst.empty()
-
-    def all_paths_return(self, warnings: List[CompilerWarning]) -> (bool, bool):
-        return False, False
+        pass
 
     def generate_code(self, code_builder: OpCodeBuilder):
         pass
 
 
 # Field base class
-class Field(SPL, TypeInferrable, BindingAnalyzable, gen_utils.CodeGenerator, gen_utils.StorageCodeGenerator):
+class Field(SPL, TypeInferrable, gen_utils.CodeGenerator, gen_utils.StorageCodeGenerator):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__()
 
-    def binding_analysis(self, context: Context, feedback: Dict[str, list]):
-        pass
-
     def infer_type(self, env: Env, sigma: InferenceType):
-        return Subst.empty()
+        pass
 
     def generate_code(self, code_builder: OpCodeBuilder):
         pass
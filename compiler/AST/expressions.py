@@ -1,16 +1,15 @@
 from enum import Enum, auto
-from typing import Dict, List
+from typing import List
 
 import compiler.AST.base as base
 from compiler.AST.base import Expr, Field
-from compiler.analysis.binding import Context
 from compiler.analysis.typing import Env
-from compiler.analysis.unification import InferenceType, Subst, InferenceInt, InferenceBool, InferenceList, \
+from compiler.analysis.unification import InferenceType, InferenceInt, InferenceBool, InferenceList, \
     InferenceChar, InferenceTuple
 import compiler.code_generation.generic.op_codes as codes
 from compiler.code_generation.generic.OpCodeBuilder import OpCodeBuilder
 from compiler.code_generation.generic.generator_utils import FunctionInstance
-from compiler.errors import UnknownFunctionError, FunCallArgsMismatch, NoFunctionInstanceError, NumberUnderflowError, \
+from compiler.errors import FunCallArgsMismatch, NoFunctionInstanceError, NumberUnderflowError, \
     NumberOverflowError
 
 
@@ -41,13 +40,16 @@ class UnaryOpType(Enum):
 # ************************** Expressions **************************
 
 class Op(Expr):
+    __slots__ = ('expr1', 'op_type', 'expr2')
+    child_slots = ('expr1', 'expr2')
+
     def __init__(self, expr1: Expr, op_type: BinaryOpType, expr2: Expr):
         super().__init__()
         self.expr1 = expr1
         self.op_type = op_type
         self.expr2 = expr2
 
-    def pretty_print(self, i=0):
+    def write(self, out: List[str], i=0):
         op = {
             BinaryOpType.Add: '+',
             BinaryOpType.Sub: '-',
@@ -64,7 +66,11 @@ class Op(Expr):
             BinaryOpType.Cons: ':',
             BinaryOpType.Mod: '%'
         }.get(self.op_type)
-        return f'({self.expr1.pretty_print(i)} {op} {self.expr2.pretty_print(i)})'
+        out.append('(')
+        yield self.expr1.write(out, i)
+        out.append(f' {op} ')
+        yield self.expr2.write(out, i)
+        out.append(')')
 
     def infer_type(self, env: Env, sigma: InferenceType):
         e1_type, e2_type, result_type = None, None, None
@@ -83,25 +89,25 @@ class Op(Expr):
             tv = env.fresh_type_var()
             e1_type, e2_type, result_type = tv, InferenceList(tv), InferenceList(tv)
 
-        star1 = self.expr1.infer_type(env, e1_type)
-        env.substitute(star1)
-        star2 = self.expr2.infer_type(env, e2_type.substitute(star1)).compose(star1)
-        return sigma.substitute(star2).unify_or_type_error(result_type.substitute(star2), self.code_range).compose(
-            star2)
+        if self.op_type is BinaryOpType.Eq or self.op_type is BinaryOpType.Neq or self.op_type is BinaryOpType.Add:
+            env.annotate(self.expr1, e1_type)  # Overloaded, code generation depends on the operand types
+            env.annotate(self.expr2, e2_type)
+        yield self.expr1.infer_type(env, e1_type)
+        yield self.expr2.infer_type(env, e2_type)
+        sigma.unify_or_type_error(result_type, self.code_range)
 
-    def binding_analysis(self, context: Context, feedback: Dict[str, list]):
-        self.expr1.binding_analysis(context, feedback)
-        self.expr2.binding_analysis(context, feedback)
+    def needs_operand_types(self):  # The code of these operators depends on the types of the operands
+        return self.op_type is BinaryOpType.Eq or self.op_type is BinaryOpType.Neq or self.op_type is BinaryOpType.Add
 
     def generate_code(self, code_builder: OpCodeBuilder):
-        self.expr1.generate_code(code_builder)
-        self.expr2.generate_code(code_builder)
+        yield self.expr1.generate_code(code_builder)
+        yield self.expr2.generate_code(code_builder)
 
         if self.op_type is BinaryOpType.Eq or self.op_type is BinaryOpType.Neq or self.op_type is BinaryOpType.Add:
             t1, t2 = code_builder.get_type(self.expr1), code_builder.get_type(self.expr2)
 
-            subst = t1.unify(t2)  # To handle cases with empty list
-            t1, t2 = t1.substitute(subst), t2.substitute(subst)
+            t1.unify(t2)  # To handle cases with empty list
+            t1, t2 = t1.resolve(), t2.resolve()
 
             if self.op_type is BinaryOpType.Eq:
                 code = codes.Eq()
@@ -143,14 +149,19 @@ class Op(Expr):
 
 
 class UnaryOp(Expr):
+    __slots__ = ('op_type', 'expr')
+    child_slots = ('expr',)
+
     def __init__(self, op_type: UnaryOpType, expr: Expr):
         super().__init__()
         self.op_type = op_type
         self.expr = expr
 
-    def pretty_print(self, i=0):
+    def write(self, out: List[str], i=0):
         op = {UnaryOpType.Min: '-', UnaryOpType.Neg: '!'}.get(self.op_type)
-        return f'({op}{self.expr.pretty_print(i)})'
+        out.append(f'({op}')
+        yield self.expr.write(out, i)
+        out.append(')')
 
     def infer_type(self, env: Env, sigma: InferenceType):
         e_type, result_type = None, None
@@ -161,14 +172,11 @@ class UnaryOp(Expr):
             if isinstance(self.expr, ConstNumber):
                 self.expr.minus = True
 
-        star = self.expr.infer_type(env, e_type)
-        return sigma.substitute(star).unify_or_type_error(result_type.substitute(star), self.code_range).compose(star)
-
-    def binding_analysis(self, context: Context, feedback: Dict[str, list]):
-        self.expr.binding_analysis(context, feedback)
+        yield self.expr.infer_type(env, e_type)
+        sigma.unify_or_type_error(result_type, self.code_range)
 
     def generate_code(self, code_builder: OpCodeBuilder):
-        self.expr.generate_code(code_builder)
+        yield self.expr.generate_code(code_builder)
         code = {
             UnaryOpType.Min: codes.Neg(),
             UnaryOpType.Neg: codes.Not(),
@@ -178,34 +186,41 @@ class UnaryOp(Expr):
 
 
 class ConstNumber(Expr):
+    __slots__ = ('value', 'minus')
+
     def __init__(self, value: int):
         super().__init__()
         self.value = value
         self.minus = False
 
-    def pretty_print(self, i=0):
-        return str(self.value)
+    def write(self, out: List[str], i=0):
+        out.append(str(self.value))
 
     def infer_type(self, env: Env, sigma: InferenceType):
         if not self.minus and self.value > 0x7fffffff:  # Check for int overflow
             raise NumberOverflowError(self.value, self.code_range)
         elif self.minus and self.value > 0x80000000:  # Check for int underflow
             raise NumberUnderflowError(self.value, self.code_range)
-        return sigma.unify_or_type_error(InferenceInt(), self.code_range)
+        sigma.unify_or_type_error(InferenceInt(), self.code_range)
 
     def generate_code(self, code_builder: OpCodeBuilder):
         code_builder.add(codes.PushConst(self.value))
 
 
 class ConstString(Expr):
+    __slots__ = ('value',)
+
     def __init__(self, value: str):
         super().__init__()
         self.value = value
 
-    def pretty_print(self, i=0):
-        return self.value
+    def write(self, out: List[str], i=0):  # Escaped so it parses to the same string again, see Parser.parse_term
+        out.append('"' + self.value.encode('unicode_escape').decode('ascii').replace('"', '\\x22') + '"')
 
-    def generate_code(self, code_builder: OpCodeBuilder):
+    def infer_type(self, env: Env, sigma: InferenceType):
+        sigma.unify_or_type_error(InferenceList(InferenceChar()), self.code_range)
+
+    def generate_code(self, code_builder: OpCodeBuilder):  # Push all chars, then cons them onto the empty list
         for c in self.value:
             code_builder.add(codes.PushConst(ord(c)))
         code_builder.add(codes.CreateListNil())
@@ -214,6 +229,8 @@ class ConstString(Expr):
 
 
 class ConstChar(Expr):
+    __slots__ = ('value',)
+
     def __init__(self, value: str):
         super().__init__()
         if len(value) > 1 and value[0] == '\\' and value[1] == 'n':
@@ -222,25 +239,27 @@ class ConstChar(Expr):
         else:
             self.value = value[0]
 
-    def pretty_print(self, i=0):
-        return f'\'{self.value}\''
+    def write(self, out: List[str], i=0):
+        out.append(f'\'{self.value}\'')
 
     def infer_type(self, env: Env, sigma: InferenceType):
-        return sigma.unify_or_type_error(InferenceChar(), self.code_range)
+        sigma.unify_or_type_error(InferenceChar(), self.code_range)
 
     def generate_code(self, code_builder: OpCodeBuilder):
         code_builder.add(codes.PushConst(ord(self.value)))
 
 class ConstBool(Expr):
+    __slots__ = ('value',)
+
     def __init__(self, value: bool):
         super().__init__()
         self.value = value
 
-    def pretty_print(self, i=0):
-        return str(self.value)
+    def write(self, out: List[str], i=0):
+        out.append(str(self.value))
 
     def infer_type(self, env: Env, sigma: InferenceType):
-        return sigma.unify_or_type_error(InferenceBool(), self.code_range)
+        sigma.unify_or_type_error(InferenceBool(), self.code_range)
 
     def generate_code(self, code_builder: OpCodeBuilder):
         if self.value:
@@ -250,81 +269,84 @@ class ConstBool(Expr):
 
 
 class FieldExpr(Expr):
+    __slots__ = ('field',)
+    child_slots = ('field',)
+
     def __init__(self, field: Field):
         super().__init__()
         self.field = field
 
-    def pretty_print(self, i=0):
-        return self.field.pretty_print(i)
-
-    def binding_analysis(self, context: Context, feedback: Dict[str, list]):
-        self.field.binding_analysis(context, feedback)
+    def write(self, out: List[str], i=0):
+        return self.field.write(out, i)
 
     def infer_type(self, env: Env, sigma: InferenceType):
         return self.field.infer_type(env, sigma)
 
     def generate_code(self, code_builder: OpCodeBuilder):
-        self.field.generate_code(code_builder)
+        return self.field.generate_code(code_builder)
 
 
 class EmptyList(Expr):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__()
 
-    def pretty_print(self, i=0):
-        return '[]'
+    def write(self, out: List[str], i=0):
+        out.append('[]')
 
     def infer_type(self, env: Env, sigma: InferenceType):
-        return sigma.unify_or_type_error(InferenceList(env.fresh_type_var()), self.code_range)
+        sigma.unify_or_type_error(InferenceList(env.fresh_type_var()), self.code_range)
 
     def generate_code(self, code_builder: OpCodeBuilder):
         code_builder.add(codes.CreateListNil())
 
 
 class Tuple(Expr):
+    __slots__ = ('fst', 'snd')
+    child_slots = ('fst', 'snd')
+
     def __init__(self, fst: Expr, snd: Expr):
         super().__init__()
         self.fst = fst
         self.snd = snd
 
-    def pretty_print(self, i=0):
-        return f'({self.fst.pretty_print(i)}, {self.snd.pretty_print(i)})'
-
-    def binding_analysis(self, context: Context, feedback: Dict[str, list]):
-        self.fst.binding_analysis(context, feedback)
-        self.snd.binding_analysis(context, feedback)
+    def write(self, out: List[str], i=0):
+        out.append('(')
+        yield self.fst.write(out, i)
+        out.append(', ')
+        yield self.snd.write(out, i)
+        out.append(')')
 
     def infer_type(self, env: Env, sigma: InferenceType):
         a1, a2 = env.fresh_type_var(), env.fresh_type_var()
-        star1 = self.fst.infer_type(env, a1)
-        env.substitute(star1)
-        star2 = self.snd.infer_type(env, a2).compose(star1)
-        return sigma.substitute(star2).unify_or_type_error(InferenceTuple(a1, a2).substitute(star2), self.code_range) \
-            .compose(star2)
+        yield self.fst.infer_type(env, a1)
+        yield self.snd.infer_type(env, a2)
+        sigma.unify_or_type_error(InferenceTuple(a1, a2), self.code_range)
 
     def generate_code(self, code_builder: OpCodeBuilder):
-        self.fst.generate_code(code_builder)
-        self.snd.generate_code(code_builder)
+        yield self.fst.generate_code(code_builder)
+        yield self.snd.generate_code(code_builder)
         code_builder.add(codes.CreateTuple())
 
 
 class FunctionCall(Expr):
+    __slots__ = ('function_name', 'expressions')
+    child_slots = ('expressions',)
+
     def __init__(self, function_name: base.Text, expressions: List[Expr]):
         super().__init__()
         self.function_name = function_name
         self.expressions = expressions
 
-    def pretty_print(self, i=0):
-        args = '(' + ''.join([x.pretty_print(i) + (', ' if index + 1 < len(self.expressions) else '')
-                              for index, x in enumerate(self.expressions)]) + ')'
-        return f'{self.function_name.pretty_print(i)}{args}'
-
-    def binding_analysis(self, context: Context, feedback: Dict[str, list]):
-        if self.function_name.value not in context.functions:
-            feedback['errors'] = [] if feedback.get('errors') is None else feedback['errors']
-            feedback['errors'].append(UnknownFunctionError(self.code_range, self.function_name.value))
-        for arg in self.expressions:
-            arg.binding_analysis(context, feedback)
+    def write(self, out: List[str], i=0):
+        yield self.function_name.write(out, i)
+        out.append('(')
+        for index, x in enumerate(self.expressions):
+            yield x.write(out, i)
+            if index + 1 < len(self.expressions):
+                out.append(', ')
+        out.append(')')
 
     def infer_type(self, env: Env, sigma: InferenceType):
         f = env.functions.get(self.function_name.value)
@@ -335,24 +357,21 @@ class FunctionCall(Expr):
             if args_len != tv_len:
                 raise FunCallArgsMismatch(self.code_range, self.function_name.value, args_len, tv_len)
 
-            subst = Subst.empty()
             for exp, tv in zip(self.expressions, f.usage.arg_types):
-                subst = exp.infer_type(env, tv.substitute(subst)).compose(subst)
-                env.substitute(subst)
-            return sigma.unify_or_type_error(f.usage.return_type.substitute(subst), self.code_range).compose(subst)
+                env.annotate(exp, tv)
+                yield exp.infer_type(env, tv)
+            sigma.unify_or_type_error(f.usage.return_type, self.code_range)
         else:  # Function was not yet declared
             type_vars = []
-            subst = Subst.empty()
             for arg in self.expressions:
                 tv = env.fresh_type_var()
                 type_vars.append(tv)
-                subst = arg.infer_type(env, tv).compose(subst)
-                env.substitute(subst)
+                env.annotate(arg, tv)
+                yield arg.infer_type(env, tv)
             env.add_fun_usage(self.function_name.value, type_vars, sigma, self.code_range)
-            return subst
 
     def generate_code(self, code_builder: OpCodeBuilder):
         arg_types = [code_builder.get_type(e) for e in self.expressions]
         for e in self.expressions:
-            e.generate_code(code_builder)
+            yield e.generate_code(code_builder)
         code_builder.add_call(self.function_name.value, arg_types)
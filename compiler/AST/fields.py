@@ -1,15 +1,15 @@
 from __future__ import annotations
 
 from enum import Enum, auto
-from typing import Dict
+from typing import List
 
 import compiler.AST.base as base
-from compiler.analysis.binding import Context
+from compiler.analysis.binding import ScopeKind
 from compiler.analysis.typing import Env
 from compiler.analysis.unification import InferenceType, InferenceTuple, InferenceList
 import compiler.code_generation.generic.op_codes as codes
+import compiler.code_generation.generic.generator_utils as gen_utils
 from compiler.code_generation.generic.OpCodeBuilder import OpCodeBuilder
-from compiler.errors import UnknownVariableError
 
 
 # ************************** Fields **************************
@@ -22,86 +22,77 @@ class FieldType(Enum):
 
 
 class Variable(base.Field):
+    __slots__ = ('name', 'id_number', 'storage')
+
     def __init__(self, name: str, id_number: int = None):
         super().__init__()
         self.name = name
         self.id_number = id_number
+        self.storage = None  # (scope kind, slot), set by binding analysis
 
-    def pretty_print(self, i=0):
+    def write(self, out: List[str], i=0):
         id_str = '' if self.id_number is None else f'[ {self.id_number} ]'
-        return self.name + id_str
-
-    def binding_analysis(self, context: Context, feedback: Dict[str, list]):
-        if (v := context.get_variable(self.name)) is not None:
-            self.id_number = v
-        else:
-            feedback['errors'] = [] if feedback.get('errors') is None else feedback['errors']
-            feedback['errors'].append(UnknownVariableError(self.code_range, self.name))
+        out.append(self.name + id_str)
 
     def infer_type(self, env: Env, sigma: InferenceType):
-        type_var = env.get_var(self.id_number)
-        result = sigma.unify_or_type_error(type_var, self.code_range)
-        env.substitute(result)
-        return result
+        sigma.unify_or_type_error(env.get_var(self.id_number), self.code_range)
 
     def generate_code(self, code_builder: OpCodeBuilder):
-        if code_builder.is_global(self.id_number):
-            glob = code_builder.get_global(self.id_number)
-            code_builder.add(codes.LdGlob(glob))
+        kind, slot = self.storage
+        if kind is ScopeKind.Global:
+            code_builder.add(codes.LdGlob(gen_utils.Global(slot)))
         else:
-            loc = code_builder.get_local(self.id_number)
-            code_builder.add(codes.LdLoc(loc))
+            code_builder.add(codes.LdLoc(gen_utils.Local(slot)))
 
     def generate_storage_code(self, code_builder: OpCodeBuilder):
-        if code_builder.is_global(self.id_number):
-            glob = code_builder.get_global(self.id_number)
-            code_builder.add(codes.StGlob(glob))
+        kind, slot = self.storage
+        if kind is ScopeKind.Global:
+            code_builder.add(codes.StGlob(gen_utils.Global(slot)))
         else:
-            loc = code_builder.get_local(self.id_number)
-            code_builder.add(codes.StLoc(loc))
+            code_builder.add(codes.StLoc(gen_utils.Local(slot)))
 
 
 class Accessor(base.Field):
+    __slots__ = ('field_type', 'field')
+    child_slots = ('field',)
+
     def __init__(self, field_type: FieldType, field: base.Field):
         super().__init__()
         self.field_type = field_type
         self.field = field
 
-    def pretty_print(self, i=0):
+    def write(self, out: List[str], i=0):
         accessor = {
             FieldType.Fst: 'fst',
             FieldType.Snd: 'snd',
             FieldType.Hd: 'hd',
             FieldType.Tl: 'tl'
         }.get(self.field_type)
-        return f'{self.field.pretty_print(i)}.{accessor}'
-
-    def binding_analysis(self, context: Context, feedback: Dict[str, list]):
-        self.field.binding_analysis(context, feedback)
+        yield self.field.write(out, i)
+        out.append(f'.{accessor}')
 
     def infer_type(self, env: Env, sigma: InferenceType):
         if self.field_type == FieldType.Fst:
             tup = InferenceTuple(sigma, env.fresh_type_var())
-            return self.field.infer_type(env, tup)
+            yield self.field.infer_type(env, tup)
         elif self.field_type == FieldType.Snd:
             tup = InferenceTuple(env.fresh_type_var(), sigma)
-            return self.field.infer_type(env, tup)
+            yield self.field.infer_type(env, tup)
         elif self.field_type == FieldType.Hd:
             lst = InferenceList(sigma)
-            return self.field.infer_type(env, lst)
+            yield self.field.infer_type(env, lst)
         elif self.field_type == FieldType.Tl:
             lst = InferenceList(env.fresh_type_var())
-            star = sigma.unify_or_type_error(lst, self.code_range)
-            env.substitute(star)
-            return self.field.infer_type(env, sigma.substitute(star)).compose(star)
+            sigma.unify_or_type_error(lst, self.code_range)
+            yield self.field.infer_type(env, sigma)
         else:
             raise Exception('Unknown field accessor')
 
     def generate_code(self, code_builder: OpCodeBuilder):
-        self.field.generate_code(code_builder)
+        yield self.field.generate_code(code_builder)
         code_builder.add(codes.LdFld(self.field_type))
 
     def generate_storage_code(self, code_builder: OpCodeBuilder):
-        self.field.generate_code(code_builder)
+        yield self.field.generate_code(code_builder)
         code_builder.add(codes.Swp())
         code_builder.add(codes.StFld(self.field_type))
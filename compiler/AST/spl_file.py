@@ -1,39 +1,84 @@
 from typing import List, Dict
 
-from compiler.AST.base import SPL, Decl
+from compiler.AST.base import SPL, Decl, get_indent
 from compiler.AST.declarations import VarDecl, FunDecl
-from compiler.analysis.binding import BindingAnalyzable, Context
+from compiler.analysis.binding import Context
+from compiler.analysis.scheduling import dependency_levels
 from compiler.analysis.typing import TypeInferrable, Env
-from compiler.analysis.unification import InferenceType, Subst
+from compiler.analysis.unification import InferenceType
 
 # SPLFile - top node
 from compiler.errors import DuplicateFunctionError, DuplicateIdentifierError, UnknownVarTypeError
 
 
-class SPLFile(SPL, TypeInferrable, BindingAnalyzable):
+class SPLFile(SPL, TypeInferrable):
+    __slots__ = ('declarations',)
+    child_slots = ('declarations',)
+
     def __init__(self, declarations: List[Decl]):
         super().__init__()
         self.declarations = declarations
 
-    def pretty_print(self, i=0):
-        return ''.join([x.indented_print(i) + '\n' for index, x in enumerate(self.declarations)])
+    def write(self, out: List[str], i=0):
+        for x in self.declarations:
+            out.append(get_indent(i))
+            yield x.write(out, i)
+            out.append('\n')
+
+    # Declarations are inferred after the declarations they use, strongly connected ones in source order. Components
+    # found in cache are not inferred again. See scheduling.infer_parallel for the same with worker processes. Inference
+    # stops at the first type error in this order, which need not be the first in the source. A function is typed
+    # before its calls, so a wrong argument is reported at the argument rather than at the call
+    def infer_type(self, env: Env, sigma: InferenceType, cache=None):
+        env.set_global_vars(self.global_var_ids())
+        refs = self.references()
+        for level in dependency_levels(self.dependencies(refs)):
+            for component in level:
+                key = None if cache is None else cache.key(self, component, refs, env)
+                if key is None or not cache.restore(self, component, key, env):
+                    base = env.n
+                    for i in component:
+                        yield self.declarations[i].infer_type(env, sigma)
+                    if key is not None:
+                        cache.store(self, component, key, env, base)
+        self.check_global_types(env)
+
+    def global_var_ids(self):
+        return [x.id_number for x in self.declarations if isinstance(x, VarDecl)]
 
-    def infer_type(self, env: Env, sigma: InferenceType):
-        env.global_var_ids = [x.id_number for x in self.declarations if isinstance(x, VarDecl)]
-        subst = Subst.empty()
-        for d in self.declarations:
-            subst = subst.compose(d.infer_type(env, sigma))
-            env.substitute(subst)
+    def references(self):  # Per declaration, see Context.references
+        return [decl.references for decl in self.declarations]
+
+    def dependencies(self, references: List[tuple]):  # Per declaration, the indices of the declarations it uses
+        functions, variables = {}, {}
+        for i, decl in enumerate(self.declarations):
+            if isinstance(decl, FunDecl):
+                functions.setdefault(decl.name.value, i)
+            else:
+                variables[decl.id_number] = i
+        return [sorted({functions[x] for x in names if x in functions} | {variables[x] for x in ids})
+                for names, ids, *_ in references]
 
+    def external_references(self, component: List[int], references: List[tuple]):  # Uses from outside component
+        names, ids = set(), set()
+        for i in component:
+            names |= references[i][0]
+            ids |= references[i][1]
+        for i in component:
+            if isinstance(decl := self.declarations[i], FunDecl):
+                names.discard(decl.name.value)
+            else:
+                ids.discard(decl.id_number)
+        return sorted(names), sorted(ids)
+
+    def check_global_types(self, env: Env):  # Globals need a type without type variables
         tv_globals = env.get_globals_with_tv()
         for (g, tv) in tv_globals:
             for d in self.declarations:
                 if isinstance(d, VarDecl) and d.id_number == g:
                     raise UnknownVarTypeError(d.code_range, tv, d.name.value)
 
-        return subst
-
-    def binding_analysis(self, context: Context, feedback: Dict[str, list]):
+    def bind_globals(self, context: Context, feedback: Dict[str, list]):  # Opens the global scope
         has_main = False
         context.push_scope()
         # Add all global function and variable names to context
@@ -57,7 +102,3 @@ class SPLFile(SPL, TypeInferrable, BindingAnalyzable):
         # Program needs a main function
         if not has_main:
             raise Exception('Function \'main\' is required but was not found')
-        # Now perform binding analysis
-        for decl in self.declarations:
-            decl.binding_analysis(context, feedback)
-        context.pop_scope()
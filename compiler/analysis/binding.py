@@ -1,54 +1,110 @@
-from abc import ABC, abstractmethod
-from typing import List, Dict, Union
+from enum import Enum, auto
+from typing import List, Dict, Optional, Tuple
 
-from compiler.compiler_warnings import CompilerWarning
-from compiler.errors import BindingError
+from compiler.analysis.passes import AnalysisPass, SKIP_CHILDREN
+from compiler.compiler_warnings import VariableHidingWarning
+from compiler.errors import DuplicateIdentifierError, UnknownFunctionError, UnknownVariableError
 
 
+class ScopeKind(Enum):
+    Global = auto()
+    Local = auto()  # Function arguments are locals with a negative slot
+
+
+# Symbol table with one dict per namespace that maps a name to its stack of bindings, innermost binding last. A binding
+# is a (scope depth, id) pair. Every scope keeps an undo log of the names it bound, pop_scope removes exactly those, so
+# lookups, inserts and pops don't depend on the nesting depth
 class Context:
     def __init__(self):
-        self.variables: List[Dict[str, int]] = []
+        self.variables: Dict[str, List[Tuple[int, int]]] = {}
         self.functions = {}
-        self.types: List[Dict[str, int]] = []
+        self.types: Dict[str, List[Tuple[int, int]]] = {}
+        self.scopes: List[List[Tuple[dict, str]]] = []  # Undo log per scope
         self.counter = 0
+        # Where each variable is stored: id -> (scope kind, slot). Globals are numbered in declaration order, locals of a
+        # function get the slots after its arguments, so the frame of a function is known after binding analysis
+        self.storage: Dict[int, Tuple[ScopeKind, int]] = {}
+        self.global_slots = 0
+        self.next_local_slot: Optional[int] = None  # None outside of functions
+        self.frame_size = 0
+        # Names of the functions called, ids of the globals used and the expressions whose types code generation needs
+        # (see Env.node_types) in the top level declaration being analysed. The last list groups those expressions by
+        # use, as the name of the function they are arguments of (None for operands) and their number
+        self.references: Optional[Tuple[set, set, list, list]] = None
 
     def get_variable(self, var: str):
-        for scope in reversed(self.variables):
-            v = scope.get(var)
-            if v is not None:
-                return v
+        if (bindings := self.variables.get(var)) is not None:
+            return bindings[-1][1]
         return None
 
     def get_variable_current_scope(self, var: str):
-        return self.variables[-1].get(var)
+        if (bindings := self.variables.get(var)) is not None and bindings[-1][0] == len(self.scopes):
+            return bindings[-1][1]
+        return None
 
-    def add_variable(self, var: str):
-        if self.variables[-1].get(var):
-            raise Exception(f'Variable {var} is already defined in current scope')
+    def bind(self, table: dict, name: str):
         new_tv = self.counter
-        self.variables[-1][var] = new_tv
+        table.setdefault(name, []).append((len(self.scopes), new_tv))
+        self.scopes[-1].append((table, name))
         self.counter += 1
         return new_tv
 
+    def add_variable(self, var: str, slot: int = None):  # slot is only given for function arguments
+        if self.get_variable_current_scope(var):
+            raise Exception(f'Variable {var} is already defined in current scope')
+        new_tv = self.bind(self.variables, var)
+        if slot is not None:
+            self.storage[new_tv] = (ScopeKind.Local, slot)
+        elif self.next_local_slot is None:
+            self.storage[new_tv] = (ScopeKind.Global, self.global_slots)
+            self.global_slots += 1
+        else:
+            self.storage[new_tv] = (ScopeKind.Local, self.next_local_slot)
+            self.next_local_slot += 1
+            self.frame_size = self.next_local_slot
+        return new_tv
+
+    def get_storage(self, var_id: int):
+        return self.storage.get(var_id)
+
+    def begin_frame(self, num_args: int):
+        self.next_local_slot, self.frame_size = num_args, 0
+
+    def end_frame(self):  # Number of local slots the function needs
+        self.next_local_slot = None
+        return self.frame_size
+
+    def begin_references(self):  # Before a top level declaration
+        self.references = (set(), set(), [], [])
+
+    def end_references(self):
+        references, self.references = self.references, None
+        return references
+
+    def use_function(self, name: str):
+        if self.references is not None:
+            self.references[0].add(name)
+
+    def use_variable(self, var_id: int):
+        if self.references is not None and self.storage[var_id][0] is ScopeKind.Global:
+            self.references[1].add(var_id)
+
+    def need_types(self, *nodes, function: str = None):
+        if self.references is not None:
+            self.references[2].extend(nodes)
+            self.references[3].append((function, len(nodes)))
+
     def get_or_add_type(self, name: str):
-        for scope in reversed(self.types):
-            v = scope.get(name)
-            if v is not None:
-                return v
+        if (bindings := self.types.get(name)) is not None:
+            return bindings[-1][1]
         # Doesn't exist, add new
-        new_tv = self.counter
-        self.types[-1][name] = new_tv
-        self.counter += 1
-        return new_tv
+        return self.bind(self.types, name)
 
     def has_type(self, name: str):
-        for scope in reversed(self.types):
-            if name in scope:
-                return True
-        return False
+        return name in self.types
 
     def collect_variables(self):
-        return [v for scope in self.variables for v in scope]
+        return [v for v, bindings in self.variables.items() for _ in bindings]
 
     def collect_functions(self):
         return list(self.functions)
@@ -60,15 +116,109 @@ class Context:
         return self.functions.get(name) is not None
 
     def push_scope(self):
-        self.variables.append({})
-        self.types.append({})
+        self.scopes.append([])
 
     def pop_scope(self):
-        del self.variables[-1]
-        del self.types[-1]
-
-
-class BindingAnalyzable(ABC):
-    @abstractmethod
-    def binding_analysis(self, context: Context, feedback: Dict[str, Union[List[BindingError], List[CompilerWarning]]]):
-        pass
+        for table, name in reversed(self.scopes.pop()):
+            bindings = table[name]
+            bindings.pop()
+            if not bindings:
+                del table[name]
+
+
+# Binding analysis of a whole SPL file as a pass, see PassManager. Errors and warnings are collected in feedback
+class BindingAnalysis(AnalysisPass):
+    name = 'binding analysis'
+    after = ['return value checking']
+
+    def __init__(self, context: Context):
+        self.context = context
+        self.feedback = {'errors': [], 'warnings': []}
+        self.first_local_id = 0  # Ids from here on are bound inside declarations, the ones before are global
+        self.global_feedback = {}  # Number of errors and warnings of the global scope
+
+    def begin(self, spl):
+        spl.bind_globals(self.context, self.feedback)
+        self.first_local_id = self.context.counter
+        self.global_feedback = {key: len(items) for key, items in self.feedback.items()}
+
+    # Copies start counting ids at the same first_local_id, they are shifted to come after the ids bound so far. A copy
+    # can't be used if global types were bound (type variables in a global variable type) here or by the copy
+    def accepts(self, copy: 'BindingAnalysis'):
+        return copy.context.types.keys() == self.context.types.keys()
+
+    def merge(self, copy: 'BindingAnalysis', decls: list):
+        if (shift := self.context.counter - self.first_local_id) > 0:
+            for decl in decls:
+                decl.shift_ids(self.first_local_id, shift)
+        self.context.counter += copy.context.counter - copy.first_local_id
+        for key, items in copy.feedback.items():  # Copies also hold the feedback of the global scope
+            self.feedback.setdefault(key, []).extend(items[self.global_feedback.get(key, 0):])
+
+    def enter_FunDecl(self, decl):
+        context = self.context
+        context.push_scope()
+        context.begin_references()
+        num_args = len(decl.arg_names.arg_names)
+        context.begin_frame(num_args)
+        # Add fun arg names to current scope context
+        decl.arg_ids = [context.add_variable(arg.value, i - num_args) for i, arg in enumerate(decl.arg_names.arg_names)]
+
+    def exit_FunDecl(self, decl):
+        decl.frame_size = self.context.end_frame()
+        decl.references = self.context.end_references()
+        self.context.pop_scope()
+
+    def enter_VarDecl(self, decl):  # The name is bound by bind_globals or by enter_DeclWrapper
+        num = self.context.get_variable_current_scope(decl.name.value)
+        if num is None:
+            raise Exception(f'Variable "{decl.name.value}" is unknown in current context')
+        decl.id_number = num
+        decl.storage = self.context.get_storage(num)
+        if decl.storage[0] is ScopeKind.Global:
+            self.context.begin_references()
+
+    def exit_VarDecl(self, decl):
+        if decl.storage[0] is ScopeKind.Global:
+            decl.references = self.context.end_references()
+
+    def enter_DeclWrapper(self, stmt):  # Local variable declaration
+        decl = stmt.declaration
+        name = decl.name.value
+        if self.context.get_variable_current_scope(name) is not None:
+            self.feedback['errors'].append(DuplicateIdentifierError(decl.name.code_range, name))
+            return SKIP_CHILDREN
+        if self.context.get_variable(name) is not None:  # Search all scopes
+            self.feedback['warnings'].append(VariableHidingWarning(decl.code_range, name))
+        self.context.add_variable(name)
+
+    def enter_Block(self, block):
+        self.context.push_scope()
+
+    def exit_Block(self, block):
+        self.context.pop_scope()
+
+    def enter_Op(self, op):
+        if op.needs_operand_types():
+            self.context.need_types(op.expr1, op.expr2)
+
+    def enter_FunctionCall(self, call):
+        name = call.function_name.value
+        if name not in self.context.functions:
+            self.feedback['errors'].append(UnknownFunctionError(call.code_range, name))
+        self.context.use_function(name)
+        self.context.need_types(*call.expressions, function=name)
+
+    def enter_Variable(self, variable):
+        if (v := self.context.get_variable(variable.name)) is not None:
+            variable.id_number = v
+            variable.storage = self.context.get_storage(v)
+            self.context.use_variable(v)
+        else:
+            self.feedback['errors'].append(UnknownVariableError(variable.code_range, variable.name))
+
+    def enter_TypeVarType(self, type_var):
+        type_var.id_number = self.context.get_or_add_type(type_var.var_name)
+
+    def end(self, spl):
+        self.context.pop_scope()
@@ -0,0 +1,115 @@
+import hashlib
+import os
+import pickle
+from typing import Dict, List
+
+from compiler.AST.declarations import FunDecl, VarDecl
+from compiler.analysis.typing import BasicFunctionType, Env, FunctionInferenceType
+from compiler.analysis.unification import InferenceTypeVar
+from compiler.utils import InputHandler, fast_unpickle
+
+
+def signature(f: FunctionInferenceType):  # Type of a function with its type variables numbered in order of appearance
+    tvs = f.usage.return_type.collect_type_vars(f.collect_arg_type_vars())
+    names = {num: InferenceTypeVar(i) for i, num in enumerate(dict.fromkeys(tvs))}
+    return str(f.usage.instantiate(names))
+
+
+# Types inferred for the components of a program (see scheduling.dependency_levels), kept in a file between
+# compilations. A component is keyed by the text of its declarations and the types of the functions and globals it
+# uses from outside, so it is only inferred again if it changed or a type it depends on did. Like Env.part, only
+# components whose external references have closed types are kept. The file only holds the components of the last
+# compilation, entries are pickled separately so only the used ones are loaded
+class InterfaceCache:
+    version = 1  # Files written with another version are ignored
+
+    def __init__(self, entries: Dict[bytes, bytes] = None):
+        self.entries = {} if entries is None else entries
+        self.used: Dict[bytes, bytes] = {}
+        self.digests: List[bytes] = None  # Per declaration, hash of its text
+        self.global_names: Dict[int, str] = None
+        self.signatures: Dict[str, bytes] = {}
+        self.hits = 0
+
+    @classmethod
+    def load(cls, path: str):  # Empty cache if the file is missing or unreadable
+        try:
+            with open(path, 'rb') as f:
+                version, entries = pickle.load(f)
+        except Exception:
+            return cls()
+        return cls(entries if version == cls.version else None)
+
+    def save(self, path: str):  # Replaces the file at once, so an interrupted compilation leaves the old one
+        with open(tmp := path + '.tmp', 'wb') as f:
+            pickle.dump((self.version, self.used), f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    # A declaration ends where the next one starts. Its text is hashed instead of its tokens, which is much faster than
+    # lexing again, the same text always gives the same tokens. Only edits of whitespace and comments make a difference
+    @staticmethod
+    def declaration_digests(spl):
+        text = InputHandler.input_text
+        starts = [decl.code_range.start.offset for decl in spl.declarations] + [len(text)]
+        digests = []
+        for start, end in zip(starts, starts[1:]):
+            part = text[start:end]
+            digests.append(hashlib.blake2b(part.encode() if isinstance(part, str) else part, digest_size=16).digest())
+        return digests
+
+    def key(self, spl, component: List[int], references: List[tuple], env: Env):  # None if it can't be cached
+        if self.digests is None:
+            self.digests = self.declaration_digests(spl)
+            self.global_names = {d.id_number: d.name.value for d in spl.declarations if isinstance(d, VarDecl)}
+        h = hashlib.blake2b(digest_size=16)
+        for i in component:
+            h.update(self.digests[i])
+        names, ids = spl.external_references(component, references)
+        for name in names:
+            if (s := self.signatures.get(name)) is None:
+                if (f := env.functions.get(name)) is None or not f.is_closed():
+                    return None
+                s = self.signatures[name] = f'{name}\0{signature(f)}\0'.encode()  # Closed types don't change
+            h.update(s)
+        for num in ids:
+            if (t := env.variables.get(num)) is None or t.contains_typevar(None):
+                return None
+            h.update(f'{self.global_names[num]}\0{t}\0'.encode())
+        return h.digest()
+
+    # Adds the types of a component to env, as if it was inferred. Locals are not kept, only arguments and globals
+    def restore(self, spl, component: List[int], key: bytes, env: Env):
+        if (entry := self.entries.get(key)) is None:
+            return False
+        base, part, types = fast_unpickle(entry)
+        decls = [spl.declarations[i] for i in component]
+        for decl, (decl_types, global_type) in zip(decls, types):
+            part.node_types.update((node, t) for node, t in zip(decl.references[2], decl_types) if t is not None)
+            if isinstance(decl, FunDecl):
+                part.variables.update(zip(decl.arg_ids, part.functions[decl.name.value].usage.arg_types))
+            else:
+                part.variables[decl.id_number] = global_type
+        env.merge(part, base)
+        self.used[key] = entry
+        self.hits += 1
+        return True
+
+    # After inferring component from base. Types are stored resolved, sharing one copy of each free type variable
+    def store(self, spl, component: List[int], key: bytes, env: Env, base: int):
+        part = Env()
+        part.n = env.n
+        types, copies = [], {}
+        for i in component:
+            decl = spl.declarations[i]
+            t = None
+            if isinstance(decl, FunDecl):
+                if not (f := env.functions[decl.name.value]).is_closed():
+                    return
+                usage = BasicFunctionType([a.resolve(copies) for a in f.usage.arg_types],
+                                          f.usage.return_type.resolve(copies))
+                part.functions[decl.name.value] = FunctionInferenceType(f.quantified_type_vars, usage)
+            elif (t := env.variables[decl.id_number]).contains_typevar(None):
+                return
+            types.append(([None if (x := env.node_types.get(node)) is None else x.resolve(copies)
+                           for node in decl.references[2]], t))
+        self.used[key] = pickle.dumps((base, part, types), pickle.HIGHEST_PROTOCOL)
@@ -0,0 +1,203 @@
+import gc
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+from operator import attrgetter
+from typing import Dict, List, Optional
+
+from compiler.utils import fast_unpickle
+from compiler.walker import walk
+
+# Returned by an enter method of a pass to not visit the nodes below the node with that pass
+SKIP_CHILDREN = 'skip children'
+
+
+# Base class for an analysis that is run by a PassManager. begin, visit_decl and end may be generators, run with walk.
+# Nodes are handled by methods named after their class: enter_If is called before the nodes below an If node are visited
+# and exit_If after them. Without such a method for the class of a node, the one for its closest base class is used,
+# e.g. enter_Statement for every statement. These are plain methods, the PassManager does the traversal
+class AnalysisPass:
+    name = 'analysis'
+    after: List[str] = []  # Names of passes that have to handle a node before this pass does
+
+    def begin(self, spl):  # Before the first declaration
+        pass
+
+    def visit_decl(self, decl):  # Called once for each top level declaration, before its nodes are visited
+        pass
+
+    def end(self, spl):  # After the last declaration
+        pass
+
+    # With workers, the declarations are visited by copies of the passes in worker processes, one copy per part of the
+    # declarations. The copies are merged back in declaration order. If any pass doesn't accept a copy, the part is
+    # visited again here
+    def accepts(self, copy: 'AnalysisPass'):
+        return True
+
+    def merge(self, copy: 'AnalysisPass', decls: list):  # decls are the declarations as analysed by the copy
+        pass
+
+
+def node_method(p: AnalysisPass, prefix: str, cls: type):  # Method of p for nodes of class cls, None if there is none
+    for c in cls.__mro__:
+        if (method := getattr(p, prefix + c.__name__, None)) is not None:
+            return method
+    return None
+
+
+# Runs passes over the top level declarations in a single traversal of the nodes: each node is entered by all passes
+# (in the declared order) before the nodes below it are visited, and exited by all of them after. The children of a
+# node are given by child_slots of its class. Sharing the traversal means a node is visited once however many passes
+# run, besides sharing the worker processes (see visit_parallel). Timing is kept per pass, see switch_to
+class PassManager:
+    def __init__(self, passes: List[AnalysisPass]):
+        self.passes = self.order(passes)
+        self.timings: Dict[str, float] = {p.name: 0.0 for p in self.passes}  # Seconds spent per pass
+        self.hooks: Dict[tuple, Dict[type, tuple]] = {}  # Passes -> node class -> see node_hooks
+        self.current: Optional[AnalysisPass] = None  # Pass of the last node method called, see switch_to
+        self.started = 0.0
+        self.visits = 0  # Number of nodes visited, once for all passes
+
+    @staticmethod
+    def order(passes: List[AnalysisPass]):  # Registration order, except that a pass runs after the passes it names
+        by_name = {p.name: p for p in passes}
+        ordered, visiting = [], set()
+
+        def add(p: AnalysisPass):
+            if p in ordered:
+                return
+            if p.name in visiting:
+                raise Exception(f'Cyclic ordering between analysis passes at \'{p.name}\'')
+            visiting.add(p.name)
+            for name in p.after:  # Passes that are not run are ignored
+                if name in by_name:
+                    add(by_name[name])
+            visiting.remove(p.name)
+            ordered.append(p)
+
+        for p in passes:
+            add(p)
+        return ordered
+
+    def run_hook(self, p: AnalysisPass, hook, arg):
+        start = time.perf_counter()
+        walk(hook(arg))
+        self.timings[p.name] += time.perf_counter() - start
+
+    # The enter and exit methods of the passes for nodes of class cls as (pass, method) pairs, and a getter of the child
+    # slots of cls (None without children)
+    def node_hooks(self, cls: type, passes: tuple):
+        children = getattr(cls, 'child_slots', ())
+        entry = self.hooks.setdefault(passes, {})[cls] = (
+            [(p, m) for p in passes if (m := node_method(p, 'enter_', cls)) is not None],
+            [(p, m) for p in passes if (m := node_method(p, 'exit_', cls)) is not None],
+            attrgetter(*reversed(children)) if children else None)
+        return entry
+
+    # Visits nodes and the nodes below them with passes, the passes that did not skip a node above. nodes is a node, a
+    # list of nodes or the child slots of a node as got by the getter of node_hooks. Runs with walk. The nodes below a
+    # node with exit methods are visited by a generator of their own, the others are kept on a stack here
+    def visit_nodes(self, nodes, passes: tuple):
+        if type(nodes) is list:
+            stack = nodes[::-1]
+        else:
+            stack = list(nodes) if type(nodes) is tuple else [nodes]
+        pop, push, extend = stack.pop, stack.append, stack.extend
+        hooks = self.hooks.setdefault(passes, {})
+        visits = 0
+        while stack:
+            if (node := pop()) is None:
+                continue
+            visits += 1
+            if (entry := hooks.get(type(node))) is None:
+                entry = self.node_hooks(type(node), passes)
+            enters, exits, children = entry
+            inner = passes
+            if enters:
+                for p, enter in enters:
+                    if p is not self.current:
+                        self.switch_to(p)
+                    if enter(node) is SKIP_CHILDREN:
+                        inner = tuple(x for x in inner if x is not p)
+            if children is not None and inner:
+                if exits or inner is not passes:
+                    yield self.visit_nodes(children(node), inner)
+                elif type(below := children(node)) is tuple:  # Reversed by the getter
+                    extend(below)
+                elif type(below) is list:
+                    extend(reversed(below))
+                else:
+                    push(below)
+            if exits:
+                for p, exit_ in exits:  # Also for passes that skipped the nodes below
+                    if p is not self.current:
+                        self.switch_to(p)
+                    exit_(node)
+        self.visits += visits
+
+    # Timing every node method would cost more than most of them take. Instead the time from one node method to the
+    # next is charged to the pass of the first one, only taking the time when another pass comes next. So the time of
+    # the traversal itself is shared between the passes, like it was part of each pass when they walked the nodes
+    def switch_to(self, p: Optional[AnalysisPass]):
+        now = time.perf_counter()
+        if self.current is not None:
+            self.timings[self.current.name] += now - self.started
+        self.current, self.started = p, now
+
+    def visit_decls(self, decls: list):
+        passes = tuple(self.passes)
+        for decl in decls:
+            for p in self.passes:
+                self.run_hook(p, p.visit_decl, decl)
+            walk(self.visit_nodes(decl, passes))
+            self.switch_to(None)
+
+    def run(self, spl, workers: int = 1):
+        for p in self.passes:
+            self.run_hook(p, p.begin, spl)
+        if workers <= 1:
+            self.visit_decls(spl.declarations)
+        else:
+            self.visit_parallel(spl, workers)
+        for p in self.passes:
+            self.run_hook(p, p.end, spl)
+        return self.timings
+
+    def visit_parallel(self, spl, workers: int):
+        decls = spl.declarations
+        size = len(decls) // (workers * 4) + 1
+        parts = [(i, min(i + size, len(decls))) for i in range(0, len(decls), size)]
+        jobs = []
+        for i, j in parts:
+            try:
+                jobs.append(pickle.dumps((self.passes, decls[i:j])))
+            except RecursionError:  # Deeply nested declaration, the part is visited here
+                jobs.append(b'')
+        with ProcessPoolExecutor(workers, initializer=gc.disable) as executor:
+            results = executor.map(visit_part, jobs)
+            for (i, j), result in zip(parts, results):
+                if result:
+                    copies, part, timings, visits = fast_unpickle(result)
+                    if all(p.accepts(c) for p, c in zip(self.passes, copies)):
+                        for p, c in zip(self.passes, copies):
+                            p.merge(c, part)
+                            self.timings[p.name] += timings[p.name]
+                        self.visits += visits
+                        decls[i:j] = part
+                        continue
+                self.visit_decls(decls[i:j])
+
+
+# Runs in a worker process: visits a part of the declarations with copies of the passes. Returns the pickled copies,
+# declarations, timings and number of nodes visited, empty if they are nested too deep to be pickled
+def visit_part(job: bytes):
+    if not job:
+        return b''
+    passes, decls = pickle.loads(job)
+    manager = PassManager(passes)
+    manager.visit_decls(decls)
+    try:
+        return pickle.dumps((manager.passes, decls, manager.timings, manager.visits))
+    except RecursionError:
+        return b''
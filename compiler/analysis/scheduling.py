@@ -0,0 +1,157 @@
+import gc
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+from compiler.analysis.typing import Env
+from compiler.analysis.unification import InferenceVoid
+from compiler.utils import fast_unpickle
+from compiler.walker import walk
+
+
+# Tarjan's algorithm without recursion, edges[v] are the nodes v depends on. Every component comes out after the
+# components it depends on, with its nodes sorted
+def strongly_connected_components(edges: List[List[int]]):
+    n = len(edges)
+    index: List[int] = [None] * n
+    low = [0] * n
+    on_stack = [False] * n
+    stack, components, counter = [], [], 0
+    for root in range(n):
+        if index[root] is not None:
+            continue
+        work = [(root, 0)]  # Nodes being visited, with the position of the next edge to follow
+        while work:
+            v, i = work.pop()
+            if i == 0:
+                index[v] = low[v] = counter
+                counter += 1
+                stack.append(v)
+                on_stack[v] = True
+            for j in range(i, len(edges[v])):
+                w = edges[v][j]
+                if index[w] is None:
+                    work.append((v, j + 1))
+                    work.append((w, 0))
+                    break
+                elif on_stack[w]:
+                    low[v] = min(low[v], index[w])
+            else:
+                if low[v] == index[v]:
+                    component = []
+                    while (w := stack.pop()) != v:
+                        on_stack[w] = False
+                        component.append(w)
+                    on_stack[v] = False
+                    component.append(v)
+                    components.append(sorted(component))
+                if work:
+                    u = work[-1][0]
+                    low[u] = min(low[u], low[v])
+    return components
+
+
+# Components grouped by depth: a component only depends on components in earlier levels, so the components in a
+# level are independent of each other. Components in a level are ordered by their first node
+def dependency_levels(edges: List[List[int]]):
+    components = strongly_connected_components(edges)
+    component_of = [0] * len(edges)
+    for c, component in enumerate(components):
+        for v in component:
+            component_of[v] = c
+    depth = []
+    for c, component in enumerate(components):
+        depth.append(max((depth[component_of[w]] + 1 for v in component for w in edges[v] if component_of[w] != c),
+                         default=0))
+    levels = [[] for _ in range(max(depth, default=-1) + 1)]
+    for c in sorted(range(len(components)), key=lambda x: components[x][0]):
+        levels[depth[c]].append(components[c])
+    return levels
+
+
+# Infers the types of the declarations of spl like SPLFile.infer_type, with the independent components of a level in
+# worker processes. A component is only sent when the functions and globals it uses from outside have closed types,
+# which the worker can not change (see Env.part). Results are merged in the sequential order, so env ends up the same
+# as without workers. A component that fails in a worker is inferred again here, to report the error. Components found
+# in cache are restored before the others of their level are sent
+def infer_parallel(spl, env: Env, workers: int, cache=None):
+    env.set_global_vars(spl.global_var_ids())
+    decls = spl.declarations
+    refs = spl.references()
+    # Workers get the declarations once, for free where processes are forked
+    with ProcessPoolExecutor(workers, initializer=start_worker, initargs=(decls,)) as executor:
+        for level in dependency_levels(spl.dependencies(refs)):
+            keys = {}  # First declaration of a component to its cache key, for components that are not in cache
+            if cache is not None:
+                for component in level:
+                    if (key := cache.key(spl, component, refs, env)) is None:
+                        keys[component[0]] = None
+                    elif not cache.restore(spl, component, key, env):
+                        keys[component[0]] = key
+                level = [component for component in level if component[0] in keys]
+            base = env.n
+            jobs = {}  # First declaration of a component to the component and the types it needs
+            for component in level:
+                if (part := env.part(*spl.external_references(component, refs))) is not None:
+                    jobs[component[0]] = (component, part)
+            futures, results = {}, {}
+            if len(jobs) >= 2 * workers:  # Else not worth sending
+                firsts = list(jobs)
+                size = len(firsts) // (workers * 4) + 1
+                for i in range(0, len(firsts), size):
+                    future = executor.submit(infer_components, pickle.dumps([jobs[k] for k in firsts[i:i + size]]))
+                    for position, k in enumerate(firsts[i:i + size]):
+                        futures[k] = (future, position)
+            for component in level:
+                start = env.n
+                if (job := futures.get(component[0])) is not None:
+                    if (future := job[0]) not in results:
+                        results[future] = fast_unpickle(result) if (result := future.result()) else []
+                    job = results[future][job[1]] if results[future] else None
+                if job is not None:
+                    part, node_types = job
+                    part.node_types = {decls[i].references[2][k]: t for (i, k), t in node_types}
+                    env.merge(part, base)
+                else:
+                    for i in component:
+                        walk(decls[i].infer_type(env, InferenceVoid()))
+                if keys.get(component[0]) is not None:
+                    cache.store(spl, component, keys[component[0]], env, start)
+    spl.check_global_types(env)
+
+
+worker_declarations = []
+
+
+def start_worker(decls: list):
+    global worker_declarations
+    gc.disable()
+    worker_declarations = decls
+
+
+# Runs in a worker process: infers the components of a job, each with its own part of the env. Returns the pickled list
+# of, per component, the env without the types it was sent and the types of its expressions by declaration and
+# position in the references of the declaration, because the nodes here are copies. None for a component if inference
+# failed, empty if the results are nested too deep to be pickled
+def infer_components(job: bytes):
+    results = []
+    for component, env in pickle.loads(job):
+        sent_functions, sent_variables = list(env.functions), list(env.variables)
+        try:
+            for i in component:
+                walk(worker_declarations[i].infer_type(env, InferenceVoid()))
+            positions = {id(node): (i, k) for i in component
+                         for k, node in enumerate(worker_declarations[i].references[2])}
+            node_types = [(positions[id(node)], t) for node, t in env.node_types.items()]
+            for name in sent_functions:
+                del env.functions[name]
+            for num in sent_variables:
+                del env.variables[num]
+            env.global_var_ids, env.global_var_set, env.node_types = [], set(), {}
+            results.append((env, node_types))
+        except Exception:
+            results.append(None)
+    try:
+        return pickle.dumps(results)
+    except RecursionError:
+        return b''
@@ -1,22 +1,76 @@
+from typing import List, Tuple
+
 from compiler.AST.spl_file import SPLFile
 from compiler.AST.types import VoidReturn
-from compiler.AST.declarations import FunDecl
+from compiler.analysis.passes import AnalysisPass, PassManager
+from compiler.compiler_warnings import UnreachableCodeWarning
 from compiler.errors import NotAllPathsReturnError
 
 
-class ReturnValueChecker:
+# Checks that functions with a return value return on all paths, and warns about statements after a return. For every
+# block and statement it is found whether it contains a return and whether it returns on all paths
+class ReturnValueChecker(AnalysisPass):
+    name = 'return value checking'
+
+    def __init__(self):
+        self.warnings, self.errors = [], []
+        self.blocks: List[List[bool]] = []  # Per block being visited, the result of its statements so far
+        self.results: List[Tuple[bool, bool]] = []  # Results of blocks, until the node they are part of is exited
+
+    def begin(self, spl: SPLFile):
+        self.warnings, self.errors = [], []
+
+    def merge(self, copy: 'ReturnValueChecker', decls: list):
+        self.warnings.extend(copy.warnings)
+        self.errors.extend(copy.errors)
+
     def check_spl_file(self, spl: SPLFile):
-        warnings, errors = [], []
-        for decl in spl.declarations:
-            if isinstance(decl, FunDecl):
-                contains_return, all_return = decl.block.all_paths_return(warnings)
-                if decl.fun_type:
-                    if isinstance(decl.fun_type.return_type, VoidReturn):
-                        continue  # Ret types will be checked in type inference, missing returns no problem
-                    if not all_return:
-                        errors.append(NotAllPathsReturnError(decl.code_range, decl.name.value))
-                else:  # No fun type
-                    if contains_return is not all_return:  # Not all paths return
-                        errors.append(NotAllPathsReturnError(decl.code_range, decl.name.value))
-
-        return warnings, errors
+        PassManager([self]).run(spl)
+        return self.warnings, self.errors
+
+    def enter_Block(self, block):
+        self.blocks.append([False, False])
+
+    def exit_Block(self, block):
+        contains_return, all_return = self.blocks.pop()
+        self.results.append((contains_return, all_return))
+
+    def enter_Statement(self, stmt):
+        if self.blocks[-1][1]:
+            self.warnings.append(UnreachableCodeWarning(stmt.code_range))
+
+    def statement_result(self, contains_return: bool, all_return: bool):
+        block = self.blocks[-1]
+        block[0] = block[0] or contains_return
+        block[1] = block[1] or all_return
+
+    def enter_Return(self, stmt):  # Other statements without blocks don't return
+        self.enter_Statement(stmt)
+        self.statement_result(True, True)
+
+    def exit_BlockStatement(self, stmt):
+        self.statement_result(*self.results.pop())
+
+    def exit_While(self, stmt):
+        contains_return, all_return = self.results.pop()
+        self.statement_result(contains_return, False)
+
+    def exit_If(self, stmt):
+        if stmt.else_block is None:
+            contains_return, all_return = self.results.pop()
+            self.statement_result(contains_return, False)
+        else:
+            contains_return_else, all_return_else = self.results.pop()
+            contains_return_then, all_return_then = self.results.pop()
+            self.statement_result(contains_return_then or contains_return_else, all_return_then and all_return_else)
+
+    def exit_FunDecl(self, decl):
+        contains_return, all_return = self.results.pop()
+        if decl.fun_type:
+            if isinstance(decl.fun_type.return_type, VoidReturn):
+                return  # Ret types will be checked in type inference, missing returns no problem
+            if not all_return:
+                self.errors.append(NotAllPathsReturnError(decl.code_range, decl.name.value))
+        else:  # No fun type
+            if contains_return is not all_return:  # Not all paths return
+                self.errors.append(NotAllPathsReturnError(decl.code_range, decl.name.value))
@@ -1,6 +1,7 @@
-from typing import List, Dict, Callable
+from __future__ import annotations
+from typing import List, Dict, Iterable
 from abc import ABC, abstractmethod
-from compiler.analysis.unification import Subst, InferenceType, InferenceTypeVar
+from compiler.analysis.unification import InferenceType, InferenceTypeVar, Trail, shift_type_vars
 from compiler.utils import CodeRange
 
 
@@ -9,10 +10,10 @@ class BasicFunctionType:
         self.arg_types: List[InferenceType] = [] if arg_types is None else arg_types
         self.return_type: InferenceType = return_type
 
-    def substitute(self, subst: Subst):
+    def instantiate(self, fresh: Dict[int, InferenceType]):
         return BasicFunctionType(
-            [v.substitute(subst) for i, v in enumerate(self.arg_types)],
-            self.return_type.substitute(subst)
+            [v.instantiate(fresh) for i, v in enumerate(self.arg_types)],
+            self.return_type.instantiate(fresh)
         )
 
     def __str__(self):
@@ -25,37 +26,38 @@ class FunctionInferenceType:
         self.quantified_type_vars: List[int] = [] if quantified_type_vars is None else quantified_type_vars
         self.usage: BasicFunctionType = usage
 
-    def substitute(self, subst: Subst):
-        return FunctionInferenceType(
-            self.quantified_type_vars,
-            self.usage.substitute(subst)
-        )
-
     def instantiate(self, env):
-        subst = Subst({k: env.fresh_type_var() for i, k in enumerate(self.quantified_type_vars)})
-        return self.substitute(subst)
+        fresh = {k: env.fresh_type_var() for i, k in enumerate(self.quantified_type_vars)}
+        return FunctionInferenceType(self.quantified_type_vars, self.usage.instantiate(fresh))
+
+    # Binds the type variables of the function to the types of an instance, until the trail is undone. Only the
+    # bindings of one instance are made and undone, the rest of the environment is shared by all instances
+    def specialize(self, arg_types: List[InferenceType], trail: Trail):
+        for t, arg_type in zip(self.usage.arg_types, arg_types):
+            t.unify(arg_type.resolve(), trail)
+
+    def collect_arg_type_vars(self):
+        result = []
+        for t in self.usage.arg_types:
+            result = t.collect_type_vars(result)
+        return result
 
-    def collect_type_vars(self, result: List[int]):  # Append to given list and return result
-        tmp = []
-        for i, t in enumerate(self.usage.arg_types):
-            tmp = t.collect_type_vars(tmp)
-        tmp = self.usage.return_type.collect_type_vars(tmp)
-        return result + [x for i, x in enumerate(tmp) if x not in self.quantified_type_vars]
+    def is_closed(self):  # All type variables are quantified, so using the function never changes its type
+        tvs = self.usage.return_type.collect_type_vars(self.collect_arg_type_vars())
+        return set(tvs) <= set(self.quantified_type_vars)
 
 
 class Env:
     def __init__(self):
         self.n = 0
+        self.level = 0  # Nesting depth of the declaration being typed, given to new type variables
         self.variables: Dict[int, InferenceType] = dict()
         self.functions: Dict[str, FunctionInferenceType] = dict()
         self.global_var_ids: List[int] = []
+        self.global_var_set = set()
+        self.node_types: Dict[TypeInferrable, InferenceType] = dict()  # Expression types needed by code generation
         self.postponed_functions: Dict[str, List[(BasicFunctionType, CodeRange)]] = dict()
 
-    def substitute(self, subst: Subst):
-        self.variables = {k: v.substitute(subst) for k, v in self.variables.items()}
-        self.functions = {k: v.substitute(subst) for k, v in self.functions.items()}
-        self.postponed_functions = {k: [(t.substitute(subst), c) for (t, c) in v] for k, v in self.postponed_functions.items()}
-
     def get_var(self, num: int, crash=False):
         try:
             return self.variables[num]
@@ -63,9 +65,15 @@ class Env:
             if crash:
                 raise e
             tv = self.fresh_type_var()
+            if num in self.global_var_set:  # Global variables stay free in the whole program
+                tv.level = 0
             self.variables[num] = tv
             return tv
 
+    def set_global_vars(self, ids: List[int]):
+        self.global_var_ids = ids
+        self.global_var_set = set(ids)
+
     def update_fun_quants(self, name: str, quants: List[int]):
         fun = self.functions.get(name)
         self.functions[name] = FunctionInferenceType(quants, fun.usage)
@@ -86,15 +94,22 @@ class Env:
         ft = FunctionInferenceType(quant_type_vars, BasicFunctionType(args, ret))
         self.functions[name] = ft
 
-    def free_type_vars(self, filter_fun: Callable[[str], bool]):
-        res = []  # Uses reference to this list instead of return values of called functions below
-        for name, f in self.functions.items():
-            if filter_fun(name):
-                res = f.collect_type_vars(res)
-        for gv in self.global_var_ids:
-            if (tv := self.variables.get(gv)) is not None:
-                res = tv.collect_type_vars(res)
-        return res
+    def enter_level(self):  # Before typing a function, so its new type variables are deeper than the environment
+        self.level += 1
+
+    def generalize(self, name: str):  # Leaves the level of function name, returns the quantified type variables
+        self.level -= 1
+        f = self.functions[name]
+        type_vars = []
+        for arg_tv in f.usage.arg_types:
+            type_vars = arg_tv.collect_type_vars(type_vars, self.level)
+        self.update_fun_quants(name, type_vars)
+        # The remaining type variables of the function type are free in the environment from now on
+        keep = set(type_vars)
+        for t in f.usage.arg_types:
+            t.lower_level(self.level, keep=keep)
+        f.usage.return_type.lower_level(self.level, keep=keep)
+        return type_vars
 
     def add_builtin(self, name: str, quants: List[InferenceTypeVar], arg_types: List[InferenceType],
                     ret_type: InferenceType):
@@ -105,8 +120,41 @@ class Env:
         ft = FunctionInferenceType(quant_type_vars, BasicFunctionType(arg_types, ret_type))
         self.functions[name] = ft
 
+    # Env with only the given functions and global variables, for inferring a part of the program in another process.
+    # None unless all their types are closed, so the copies in the part stay the same as the types here
+    def part(self, function_names: Iterable[str], var_ids: Iterable[int]):
+        part = Env()
+        part.n = self.n
+        part.global_var_ids, part.global_var_set = self.global_var_ids, self.global_var_set
+        for name in function_names:
+            if (f := self.functions.get(name)) is None or not f.is_closed():
+                return None
+            part.functions[name] = f
+        for num in var_ids:
+            if (t := self.variables.get(num)) is None or t.contains_typevar(None):
+                return None
+            part.variables[num] = t
+        return part
+
+    def merge(self, part: Env, base: int):  # Adds the types inferred in a part made when n was base
+        shift = self.n - base
+        functions = {name: f for name, f in part.functions.items() if name not in self.functions}
+        variables = {num: t for num, t in part.variables.items() if num not in self.variables}
+        types = list(variables.values()) + list(part.node_types.values())
+        for f in functions.values():
+            types += f.usage.arg_types + [f.usage.return_type]
+            f.quantified_type_vars = [x + shift if x >= base else x for x in f.quantified_type_vars]
+        shift_type_vars(types, base, shift)
+        self.functions.update(functions)
+        self.variables.update(variables)
+        self.node_types.update(part.node_types)
+        self.n = part.n + shift
+
+    def annotate(self, node: TypeInferrable, t: InferenceType):
+        self.node_types[node] = t
+
     def fresh_type_var(self):
-        tv = InferenceTypeVar(self.n)
+        tv = InferenceTypeVar(self.n, self.level)
         self.n += 1
         return tv
 
@@ -121,6 +169,8 @@ class Env:
 
 
 class TypeInferrable(ABC):
+    __slots__ = ()
+
     @abstractmethod
-    def infer_type(self, env: Env, sigma: InferenceType) -> Subst:
-        return Subst.empty()
+    def infer_type(self, env: Env, sigma: InferenceType):  # Unifies sigma with the type of the node
+        pass
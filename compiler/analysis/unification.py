@@ -1,5 +1,5 @@
 from __future__ import annotations
-from typing import Dict, List
+from typing import Dict, List, Set, Tuple
 
 import compiler.errors as err
 from compiler.utils import CodeRange
@@ -17,191 +17,351 @@ class TypeRecursionError(Exception):
         self.other = other
 
 
-class Subst:
-    def __init__(self, substitutions: Dict[int, InferenceType]):
-        self.substitutions: Dict[int, InferenceType] = substitutions
+# Writes to type variables made by a unification, as (type var, previous instance, previous level). A failed
+# unification is undone with it, so errors show the types as they were before
+Trail = List[Tuple['InferenceTypeVar', 'InferenceType', int]]
 
-    @classmethod
-    def empty(cls):
-        return cls(dict())
 
-    @classmethod
-    def single(cls, num: int, replacement: InferenceType):
-        return cls({num: replacement})
+def undo(trail: Trail):
+    for tv, instance, level in reversed(trail):
+        tv.instance, tv.level = instance, level
 
-    def compose(self, other: Subst):
-        return Subst({
-            **{i: v.substitute(self) for (i, v) in other.substitutions.items()},
-            **{i: v.substitute(self) for (i, v) in self.substitutions.items()}
-        })
 
-    def get(self, num: int):
-        return self.substitutions.get(num, InferenceTypeVar(num))
+def shift_type_vars(types: List[InferenceType], first: int, shift: int):  # Adds shift to type var numbers from first on
+    stack, seen = list(types), set()
+    while stack:
+        if (t := stack.pop()).ground or id(t) in seen:
+            continue
+        seen.add(id(t))
+        if isinstance(t, InferenceTypeVar):
+            if t.num >= first:
+                t.num += shift
+            if t.instance is not None:
+                stack.append(t.instance)
+        elif isinstance(t, InferenceTuple):
+            stack += (t.t1, t.t2)
+        elif isinstance(t, InferenceList):
+            stack.append(t.t)
 
 
-# Method implementations in this base class are used for basic types int, char, bool and void
+# Types without type variables are interned by their class and parts, so equal ones are the same object and can be
+# compared and hashed by identity. Keys hold the parts, so no interned type is collected while it is in here
+interned: Dict[tuple, InferenceType] = dict()
+
+
+# Unification is destructive: type variables are union-find cells that are bound to the type they are unified with,
+# so there are no substitutions to compose and apply. Method implementations in this base class are used for basic
+# types int, char, bool and void
 class InferenceType:
-    def unify(self, other: InferenceType):
-        if other.is_type_var():
-            return other.unify(self)
+    __slots__ = ()
+    ground = True  # Contains no type variables, such types are interned and never change
 
-        if self.is_equal(other):
-            return Subst.empty()
+    def prune(self, trail: Trail = None):  # The type this type stands for, only differs for bound type variables
+        return self
+
+    def unify(self, other: InferenceType, trail: Trail = None):
+        t1, t2 = self.prune(trail), other.prune(trail)
+        if t1 is t2:
+            return
+        if t1.is_type_var():
+            t1.bind(t2, trail)
+        elif t2.is_type_var():
+            t2.bind(t1, trail)
         else:
+            t1.unify_structure(t2, trail)
+
+    def unify_structure(self, other: InferenceType, trail: Trail):  # Both types are pruned and no type variables
+        if self.__class__ != other.__class__:
             raise UnificationError(self, other)
 
     def unify_or_type_error(self, other: InferenceType, code_range: CodeRange):
+        trail = []
         try:
-            return self.unify(other)
+            self.unify(other, trail)
         except UnificationError as e:
+            undo(trail)
             raise err.TypeMismatch(code_range, self, other)
         except TypeRecursionError as e:
+            undo(trail)
             raise err.InvalidTypeError(code_range, e.tv, e.other)
 
     def is_type_var(self):
         return isinstance(self, InferenceTypeVar)
 
     def is_scalar(self):
-        return isinstance(self, InferenceInt) or isinstance(self, InferenceChar) or isinstance(self, InferenceBool)
+        t = self.prune()
+        return isinstance(t, InferenceInt) or isinstance(t, InferenceChar) or isinstance(t, InferenceBool)
 
     def contains_typevar(self, num: int):
         return False
 
+    def lower_level(self, level: int, trail: Trail = None, keep: Set[int] = frozenset()):  # See InferenceTypeVar
+        pass
+
     def is_equal(self, other):
-        return self.__class__ == other.__class__
+        return self is other.prune()
+
+    def instantiate(self, fresh: Dict[int, InferenceType]):  # Copy with the free type variables in fresh replaced
+        return self
 
-    def substitute(self, subst: Subst):
+    def resolve(self, copies: Dict[int, InferenceTypeVar] = None):  # Copy without bound type variables, see below
         return self
 
-    def collect_type_vars(self, result: List[int]) -> List[int]:
+    def collect_type_vars(self, result: List[int], level: int = None) -> List[int]:  # Only deeper than level if given
         return result
 
 
 # *************************** Basic inference types ***************************
-class InferenceInt(InferenceType):
+class BasicInferenceType(InferenceType):  # There is a single instance of each basic type
+    __slots__ = ()
+
+    def __new__(cls):
+        if (t := interned.get((cls,))) is None:
+            t = interned[(cls,)] = super().__new__(cls)
+        return t
+
+
+class InferenceInt(BasicInferenceType):
+    __slots__ = ()
+
     def __str__(self):
         return 'int'
 
 
-class InferenceChar(InferenceType):
+class InferenceChar(BasicInferenceType):
+    __slots__ = ()
+
     def __str__(self):
         return 'char'
 
 
-class InferenceBool(InferenceType):
+class InferenceBool(BasicInferenceType):
+    __slots__ = ()
+
     def __str__(self):
         return 'bool'
 
 
-class InferenceVoid(InferenceType):
+class InferenceVoid(BasicInferenceType):
+    __slots__ = ()
+
     def __str__(self):
         return 'void'
 
 
 # *************************** Tuple inference type ***************************
 class InferenceTuple(InferenceType):
-    def __init__(self, t1: InferenceType, t2: InferenceType):
-        self.t1 = t1
-        self.t2 = t2
-
-    def unify(self, other: InferenceType):
-        if other.is_type_var():
-            return other.unify(self)
-        if self.is_equal(other):
-            return Subst.empty()
-
+    __slots__ = ('t1', 't2', 'ground')
+
+    def __new__(cls, t1: InferenceType, t2: InferenceType):
+        if ground := t1.ground and t2.ground:
+            if (t := interned.get((cls, t1, t2))) is not None:
+                return t
+        t = super().__new__(cls)
+        t.t1, t.t2, t.ground = t1, t2, ground
+        if ground:
+            interned[(cls, t1, t2)] = t
+        return t
+
+    def __getnewargs__(self):  # Unpickled and copied types are interned again
+        return self.t1, self.t2
+
+    def unify_structure(self, other: InferenceType, trail: Trail):
+        if self.ground and other.ground:  # Not the same object, so not equal
+            raise UnificationError(self, other)
         if isinstance(other, InferenceTuple):
-            star = self.t1.unify(other.t1)
-            return self.t2.substitute(star).unify(other.t2).compose(star)
+            self.t1.unify(other.t1, trail)
+            self.t2.unify(other.t2, trail)
         else:
             raise UnificationError(self, other)
 
     def is_equal(self, other):
-        if isinstance(other, InferenceTuple):
+        if (other := other.prune()) is self:
+            return True
+        if isinstance(other, InferenceTuple) and not (self.ground and other.ground):
             return self.t1.is_equal(other.t1) and self.t2.is_equal(other.t2)
         else:
             return False
 
     def contains_typevar(self, num: int):
-        return self.t1.contains_typevar(num) or self.t2.contains_typevar(num)
-
-    def substitute(self, subst: Subst):
-        return InferenceTuple(self.t1.substitute(subst), self.t2.substitute(subst))
-
-    def collect_type_vars(self, result: List[int]):
-        result = self.t1.collect_type_vars(result)
-        return self.t2.collect_type_vars(result)
+        return not self.ground and (self.t1.contains_typevar(num) or self.t2.contains_typevar(num))
+
+    def lower_level(self, level: int, trail: Trail = None, keep: Set[int] = frozenset()):
+        if not self.ground:
+            self.t1.lower_level(level, trail, keep)
+            self.t2.lower_level(level, trail, keep)
+
+    def instantiate(self, fresh: Dict[int, InferenceType]):
+        if self.ground:
+            return self
+        t1, t2 = self.t1.instantiate(fresh), self.t2.instantiate(fresh)
+        return self if t1 is self.t1 and t2 is self.t2 else InferenceTuple(t1, t2)
+
+    def resolve(self, copies: Dict[int, InferenceTypeVar] = None):
+        if self.ground:
+            return self
+        copies = {} if copies is None else copies
+        return InferenceTuple(self.t1.resolve(copies), self.t2.resolve(copies))
+
+    def collect_type_vars(self, result: List[int], level: int = None):
+        if self.ground:
+            return result
+        result = self.t1.collect_type_vars(result, level)
+        return self.t2.collect_type_vars(result, level)
 
     def __str__(self):
         return f'({str(self.t1)}, {str(self.t2)})'
 
 
-# *************************** Tuple inference type ***************************
+# *************************** List inference type ***************************
 class InferenceList(InferenceType):
-    def __init__(self, t: InferenceType):
-        self.t = t
-
-    def unify(self, other: InferenceType):
-        if other.is_type_var():
-            return other.unify(self)
-        if self.is_equal(other):
-            return Subst.empty()
-
+    __slots__ = ('t', 'ground')
+
+    def __new__(cls, t: InferenceType):
+        if ground := t.ground:
+            if (lt := interned.get((cls, t))) is not None:
+                return lt
+        lt = super().__new__(cls)
+        lt.t, lt.ground = t, ground
+        if ground:
+            interned[(cls, t)] = lt
+        return lt
+
+    def __getnewargs__(self):
+        return self.t,
+
+    def unify_structure(self, other: InferenceType, trail: Trail):
+        if self.ground and other.ground:
+            raise UnificationError(self, other)
         if isinstance(other, InferenceList):
-            return self.t.unify(other.t)
+            self.t.unify(other.t, trail)
         else:
             raise UnificationError(self, other)
 
     def is_equal(self, other):
-        if isinstance(other, InferenceList):
+        if (other := other.prune()) is self:
+            return True
+        if isinstance(other, InferenceList) and not (self.ground and other.ground):
             return self.t.is_equal(other.t)
         else:
             return False
 
     def contains_typevar(self, num: int):
-        return self.t.contains_typevar(num)
+        return not self.ground and self.t.contains_typevar(num)
+
+    def lower_level(self, level: int, trail: Trail = None, keep: Set[int] = frozenset()):
+        if not self.ground:
+            self.t.lower_level(level, trail, keep)
 
-    def substitute(self, subst: Subst):
-        return InferenceList(self.t.substitute(subst))
+    def instantiate(self, fresh: Dict[int, InferenceType]):
+        if self.ground:
+            return self
+        t = self.t.instantiate(fresh)
+        return self if t is self.t else InferenceList(t)
 
-    def collect_type_vars(self, result: List[int]):
-        return self.t.collect_type_vars(result)
+    def resolve(self, copies: Dict[int, InferenceTypeVar] = None):
+        if self.ground:
+            return self
+        return InferenceList(self.t.resolve({} if copies is None else copies))
+
+    def collect_type_vars(self, result: List[int], level: int = None):
+        if self.ground:
+            return result
+        return self.t.collect_type_vars(result, level)
 
     def __str__(self):
         return f'[{str(self.t)}]'
 
 
 # *************************** Type variable inference type ***************************
+# The level of a type variable is the nesting depth of the declaration it was created in (0 for the top level). When a
+# variable is bound, the variables in its type are lowered to its level, so a variable that is still deeper than the
+# environment after a declaration was not unified with anything outside of it and can be generalized
 class InferenceTypeVar(InferenceType):
-    def __init__(self, num: int):
-        self.num = num
+    __slots__ = ('num', 'level', 'instance')
+    ground = False
 
-    def unify(self, other: InferenceType):
+    def __init__(self, num: int, level: int = 0):
+        self.num = num
+        self.level = level
+        self.instance: InferenceType = None  # Type this variable is bound to, by unification
+
+    def prune(self, trail: Trail = None):
+        if self.instance is None:
+            return self
+        root = self.instance
+        while isinstance(root, InferenceTypeVar) and root.instance is not None:
+            root = root.instance
+        tv = self
+        while tv.instance is not root:  # Path compression, all variables on the way point to the root directly
+            if trail is not None:
+                trail.append((tv, tv.instance, tv.level))
+            tv.instance, tv = root, tv.instance
+        return root
+
+    def bind(self, other: InferenceType, trail: Trail):  # Both pruned
         if self.is_equal(other):
-            return Subst.empty()
-
+            return
         if other.contains_typevar(self.num):
             raise TypeRecursionError(self.num, other)
-        else:
-            return Subst.single(self.num, other)
+        other.lower_level(self.level, trail)
+        if trail is not None:
+            trail.append((self, None, self.level))
+        self.instance = other
 
     def is_equal(self, other):
-        if isinstance(other, InferenceTypeVar):
+        if (t := self.prune()) is not self:
+            return t.is_equal(other)
+        if isinstance(other := other.prune(), InferenceTypeVar):
             return self.num == other.num
         else:
             return False
 
-    def contains_typevar(self, num: int):
+    def contains_typevar(self, num: int):  # Used in the occurs check, so doesn't compress paths (see Trail)
+        t = self
+        while isinstance(t, InferenceTypeVar) and t.instance is not None:
+            t = t.instance
+        if t is not self:
+            return t.contains_typevar(num)
         if num is None:
             return True
         return num == self.num
 
-    def substitute(self, subst: Subst):
-        return subst.get(self.num)
-
-    def collect_type_vars(self, result: List[int]):
-        result.append(self.num)
+    def lower_level(self, level: int, trail: Trail = None, keep: Set[int] = frozenset()):  # Unless num is in keep
+        if (t := self.prune(trail)) is not self:
+            t.lower_level(level, trail, keep)
+        elif self.level > level and self.num not in keep:
+            if trail is not None:
+                trail.append((self, None, self.level))
+            self.level = level
+
+    def instantiate(self, fresh: Dict[int, InferenceType]):
+        if (t := self.prune()) is not self:
+            return t.instantiate(fresh)
+        return fresh.get(self.num, self)
+
+    # Bound variables are replaced by their types and free ones by new variables with the same number. The result is
+    # not affected by later unifications, as needed for types that are kept, like the argument types of an instance.
+    # Doesn't compress paths, which could skip bindings that are undone later (see FunctionInferenceType.specialize)
+    def resolve(self, copies: Dict[int, InferenceTypeVar] = None):
+        t = self
+        while isinstance(t, InferenceTypeVar) and t.instance is not None:
+            t = t.instance
+        if t is not self:
+            return t.resolve(copies)
+        copies = {} if copies is None else copies
+        if (tv := copies.get(self.num)) is None:
+            tv = copies[self.num] = InferenceTypeVar(self.num)
+        return tv
+
+    def collect_type_vars(self, result: List[int], level: int = None):
+        if (t := self.prune()) is not self:
+            return t.collect_type_vars(result, level)
+        if level is None or self.level > level:
+            result.append(self.num)
         return result
 
     def __str__(self):
+        if (t := self.prune()) is not self:
+            return str(t)
         return f'v{self.num}'
@@ -30,19 +30,8 @@ class SSMGenerator:
 
     def generate_function_code(self, fun_instance: FunctionInstance, fun_impl: FunctionImpl):
         ssm_ops = []
-        local_vars_size = 0
-        for op in fun_impl.ops:
-            if isinstance(op, gen_codes.LdLoc):
-                off = op.local.offset() + 1
-                if off > local_vars_size:
-                    local_vars_size = off
-            elif isinstance(op, gen_codes.StLoc):
-                off = op.local.offset() + 1
-                if off > local_vars_size:
-                    local_vars_size = off
-
         ssm_ops.append(ssm.MarkFunction(fun_instance.create_identifier()))
-        ssm_ops.append(ssm.Link(local_vars_size))
+        ssm_ops.append(ssm.Link(fun_impl.frame_size))
 
         if fun_instance.entry_point:
             assert self.entry_point_name is None, \
@@ -1,22 +1,24 @@
 from __future__ import annotations
-from typing import Dict
+from typing import Callable, Dict, List
+
+from compiler.analysis.unification import InferenceType
 import compiler.code_generation.generic.generator_utils as gen_utils
 
 
 class GeneratorContext:
     def __init__(self):
-        self.needed_fun_instances: Dict[str, gen_utils.FunctionInstance] = {}
-        self.globals: Dict[int, int] = {}
+        self.fun_instances: Dict[tuple, gen_utils.FunctionInstance] = {}  # See FunctionInstance.key
+        self.needed_fun_instances: Dict[tuple, gen_utils.FunctionInstance] = {}  # Without generated code yet
+        # Per function with instances that share code, the key of the instance for argument types (see type_erasure)
+        self.instance_keys: Dict[str, Callable[[List[InferenceType]], tuple]] = {}
 
+    # Returns the instance with the same key that was required first, so its identifier is only made once. Its code is
+    # used for all instances with that key
     def require_fun_instance(self, fun_instance: gen_utils.FunctionInstance):
-        fun_str = f'{fun_instance.name}_{"_".join([str(arg) for arg in fun_instance.arg_types])}'
-        if fun_str not in self.needed_fun_instances:
-            self.needed_fun_instances[fun_str] = fun_instance
-
-    def get_global(self, id: int):
-        g = self.globals.get(id)
-        if g is None:
-            g = len(self.globals)
-            self.globals[id] = g
-        return gen_utils.Global(g)
-
+        key = fun_instance.key
+        if (instance_key := self.instance_keys.get(fun_instance.name)) is not None:
+            key = (fun_instance.name, *instance_key(fun_instance.arg_types))
+        if (instance := self.fun_instances.get(key)) is None:
+            instance = self.fun_instances[key] = fun_instance
+            self.needed_fun_instances[key] = fun_instance
+        return instance
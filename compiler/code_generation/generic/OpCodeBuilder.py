@@ -1,5 +1,5 @@
 from __future__ import annotations
-from typing import List, Dict
+from typing import List
 
 from compiler.analysis.typing import Env, TypeInferrable
 from compiler.analysis.unification import InferenceType
@@ -12,32 +12,11 @@ class OpCodeBuilder:
     def __init__(self, context: GeneratorContext, env: Env):
         self.ops: List[codes.GenericOpCode] = []
         self.label_counter = 0
-        self.local_counter = 0
-        self.locals: Dict[int, gen_utils.Local] = {}
         self.env = env
         self.context = context
 
-    def get_local(self, id: int):
-        l = self.locals.get(id)
-        if not l:
-            l = self.add_local(id, len(self.locals))
-        return l
-
-    def add_local(self, id: int, index: int):
-        l = gen_utils.Local(index)
-        self.locals[id] = l
-        return l
-
-    def is_global(self, id: int):
-        return id in self.context.globals
-
-    def get_global(self, id: int):
-        return self.context.get_global(id)
-
-    def get_type(self, ast_node: TypeInferrable):
-        sigma = self.env.fresh_type_var()
-        subst = ast_node.infer_type(self.env, sigma)
-        return sigma.substitute(subst)
+    def get_type(self, ast_node: TypeInferrable):  # Type recorded by type inference, see FunctionInferenceType.specialize
+        return self.env.node_types[ast_node].resolve()
 
     def fresh_label(self):
         self.label_counter += 1
@@ -59,7 +38,7 @@ class OpCodeBuilder:
 
     def add_call(self, fun_name: str, arg_types: List[InferenceType], hide=False):
         fun_instance = gen_utils.FunctionInstance(fun_name, arg_types=arg_types, hide_from_user=hide)
-        self.context.require_fun_instance(fun_instance)
+        fun_instance = self.context.require_fun_instance(fun_instance)
         self.add(codes.Call(
             gen_utils.Function(fun_instance.create_identifier(),
                                len(fun_instance.arg_types))
@@ -13,6 +13,7 @@ class BuiltInMethod:
         self.num_args = 0
         self.num_quants = 0
         self.return_type = InferenceVoid()
+        self.uses_types = True  # Code depends on the argument types, see type_erasure
 
     def add_to_context(self, context: Context):
         context.add_function(self.name)
@@ -23,6 +24,9 @@ class BuiltInMethod:
         quants = [tv for _ in range(self.num_quants)]
         env.add_builtin(self.name, quants, args, self.return_type)
 
+    def instance_key(self, arg_types: List[InferenceType]):  # Instances with the same key share their code
+        return tuple([a if a.ground else str(a) for a in arg_types])
+
     def generate_code(self, arg_types: List[InferenceType], code_builder: OpCodeBuilder):
         pass
 
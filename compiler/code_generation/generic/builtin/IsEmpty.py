@@ -15,12 +15,16 @@ class IsEmpty(BuiltInMethod):
         self.num_args = 1
         self.num_quants = 1
         self.return_type = uni.InferenceBool()
+        self.uses_types = False
 
     def add_to_env(self, env: Env):
         tv = env.fresh_type_var()
         quants = [tv for _ in range(self.num_quants)]
         env.add_builtin(self.name, quants, [uni.InferenceList(tv)], self.return_type)
 
+    def instance_key(self, arg_types: List[uni.InferenceType]):
+        return ()
+
     def generate_code(self, arg_types: List[uni.InferenceType], code_builder: OpCodeBuilder):
         assert len(arg_types) == 1, f'len function needs 1 argument, {len(arg_types)} where given'
         t = arg_types[0]
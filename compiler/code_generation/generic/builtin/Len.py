@@ -22,6 +22,9 @@ class Len(BuiltInMethod):
         quants = [tv for _ in range(self.num_quants)]
         env.add_builtin(self.name, quants, [uni.InferenceList(tv)], self.return_type)
 
+    def instance_key(self, arg_types: List[uni.InferenceType]):  # Only checks if the elements have a type variable type
+        return isinstance(arg_types[0].t, uni.InferenceTypeVar),
+
     def generate_code(self, arg_types: List[uni.InferenceType], code_builder: OpCodeBuilder):
         empty_label = code_builder.fresh_label()
         assert len(arg_types) == 1, f'len function needs 1 argument, {len(arg_types)} where given'
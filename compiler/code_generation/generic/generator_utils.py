@@ -36,7 +36,11 @@ class Label:
         self.id = id
 
     def get_distinct_name(self, fun_inst: FunctionInstance):
-        return f'lbl_{fun_inst.create_identifier()}_{self.id}'
+        return f'{fun_inst.get_label_prefix()}{self.id}'
+
+
+# Characters of printed types that can't be used in identifiers
+identifier_table = str.maketrans({'(': '_PO_', ')': '_PC_', '[': '_BO_', ']': '_BC_', ',': '_CM_', ' ': '_'})
 
 
 class FunctionInstance:
@@ -45,38 +49,44 @@ class FunctionInstance:
         self.arg_types = arg_types
         self.hide_from_user = hide_from_user
         self.entry_point = entry_point
-
-    def create_identifier(self):
-        if self.entry_point:
-            return self.name
-        hide = '' if self.hide_from_user else '_'
-        args = '_'.join([str(a) for a in self.arg_types])
-        raw_ident = f'{hide}{self.name}_{len(self.arg_types)}_{args}'
-        ident = ''
-        for i in raw_ident:
-            ident += {
-                '(': '_PO_',
-                ')': '_PC_',
-                '[': '_BO_',
-                ']': '_BC_',
-                ',': '_CM_',
-                ' ': '_',
-            }.get(i, i)
-        return ident
+        # Types without type variables are interned, so they are their own key. Others are compared as printed
+        self.key = (name, *[a if a.ground else str(a) for a in arg_types])
+        self.identifier = None
+        self.label_prefix = None
+
+    def create_identifier(self):  # Made once per instance, see GeneratorContext.require_fun_instance
+        if self.identifier is None:
+            if self.entry_point:
+                self.identifier = self.name
+            else:
+                hide = '' if self.hide_from_user else '_'
+                args = '_'.join([str(a) for a in self.arg_types])
+                self.identifier = f'{hide}{self.name}_{len(self.arg_types)}_{args}'.translate(identifier_table)
+        return self.identifier
+
+    def get_label_prefix(self):
+        if self.label_prefix is None:
+            self.label_prefix = f'lbl_{self.create_identifier()}_'
+        return self.label_prefix
 
 
 class FunctionImpl:
-    def __init__(self, ops):
+    def __init__(self, ops, frame_size: int = 0):
         self.ops = ops
+        self.frame_size = frame_size  # Number of local variable slots
 
 
 class CodeGenerator(ABC):
+    __slots__ = ()
+
     @abstractmethod
     def generate_code(self, code_builder: OpCodeBuilder):
         pass
 
 
 class StorageCodeGenerator(ABC):
+    __slots__ = ()
+
     @abstractmethod
     def generate_storage_code(self, code_builder: OpCodeBuilder):
         pass
\ No newline at end of file
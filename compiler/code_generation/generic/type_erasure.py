@@ -0,0 +1,89 @@
+from typing import Callable, Dict, List, Set
+
+from compiler.AST.declarations import FunDecl
+from compiler.AST.spl_file import SPLFile
+from compiler.analysis.typing import Env
+from compiler.analysis.unification import InferenceList, InferenceTuple, InferenceType, InferenceTypeVar
+
+# Code generation only looks at types through the expressions in Context.references: operands of overloaded operators
+# get code for their type and arguments select the instance of the function called. So the code of a function only
+# depends on the type variables of its arguments that occur in an operand, in an argument of a builtin whose code
+# depends on its types, or in an argument of a user function at a place where that function uses the type. Instances
+# that only differ in the other type variables get the same code and are shared
+
+
+def add_used_type_vars(pattern: InferenceType, relevant: Set[int], t: InferenceType, result: Set[int]):
+    # Adds the type variables of t that are at the places of relevant type variables in pattern, t is an instance of it
+    pattern, t = pattern.prune(), t.prune()
+    if isinstance(pattern, InferenceTypeVar):
+        if pattern.num in relevant:
+            result.update(t.collect_type_vars([]))
+    elif pattern.ground:
+        return
+    elif isinstance(t, InferenceTypeVar):  # Only part of the type is used, but that part isn't known yet
+        if not relevant.isdisjoint(pattern.collect_type_vars([])):
+            result.add(t.num)
+    elif isinstance(pattern, InferenceList) and isinstance(t, InferenceList):
+        add_used_type_vars(pattern.t, relevant, t.t, result)
+    elif isinstance(pattern, InferenceTuple) and isinstance(t, InferenceTuple):
+        add_used_type_vars(pattern.t1, relevant, t.t1, result)
+        add_used_type_vars(pattern.t2, relevant, t.t2, result)
+
+
+# Per user function, the type variables of its argument types its code depends on. Starts from the uses in each function
+# and adds those of calls until nothing changes, only callers of functions that got more are looked at again
+def relevant_type_vars(spl_file: SPLFile, env: Env, type_independent: Set[str]):
+    functions = {decl.name.value: decl for decl in spl_file.declarations if isinstance(decl, FunDecl)}
+    relevant: Dict[str, Set[int]] = {name: set() for name in functions}
+    callers: Dict[str, Set[str]] = {name: set() for name in functions}
+    for name, decl in functions.items():
+        for callee, _ in decl.references[3]:
+            if callee in callers:
+                callers[callee].add(name)
+    work = dict.fromkeys(functions)
+    while work:
+        name, _ = work.popitem()
+        nodes, uses = functions[name].references[2:]
+        found, i = set(), 0
+        for callee, count in uses:
+            types = [env.node_types[node] for node in nodes[i:i + count]]
+            i += count
+            if callee in functions:
+                for pattern, t in zip(env.functions[callee].usage.arg_types, types):
+                    add_used_type_vars(pattern, relevant[callee], t, found)
+            elif callee not in type_independent:
+                for t in types:
+                    found.update(t.collect_type_vars([]))
+        found.intersection_update(env.functions[name].collect_arg_type_vars())
+        if not found <= relevant[name]:
+            relevant[name] |= found
+            work.update(dict.fromkeys(callers[name]))
+    return relevant
+
+
+def erase(pattern: InferenceType, relevant: Set[int], t: InferenceType):  # Part of an instance key for an argument
+    if isinstance(pattern, InferenceTypeVar):
+        return (t if t.ground else str(t)) if pattern.num in relevant else None
+    if pattern.ground or relevant.isdisjoint(pattern.collect_type_vars([])):
+        return None
+    if isinstance(pattern, InferenceList) and isinstance(t, InferenceList):
+        return erase(pattern.t, relevant, t.t),
+    if isinstance(pattern, InferenceTuple) and isinstance(t, InferenceTuple):
+        return erase(pattern.t1, relevant, t.t1), erase(pattern.t2, relevant, t.t2)
+    return t if t.ground else str(t)
+
+
+# Per user function that has type variables its code doesn't depend on, the function giving the instance key of
+# argument types, see GeneratorContext.require_fun_instance. The argument types are copied, as code generation binds
+# the type variables of a function (see FunctionInferenceType.specialize)
+def instance_keys(spl_file: SPLFile, env: Env, type_independent: Set[str]):
+    keys: Dict[str, Callable[[List[InferenceType]], tuple]] = {}
+    for name, relevant in relevant_type_vars(spl_file, env, type_independent).items():
+        f = env.functions[name]
+        if set(f.collect_arg_type_vars()) <= relevant:
+            continue
+        copies = {}
+        patterns = [a.resolve(copies) for a in f.usage.arg_types]
+        keys[name] = lambda arg_types, patterns=patterns, relevant=relevant: \
+            tuple([erase(p, relevant, t) for p, t in zip(patterns, arg_types)])
+    return keys
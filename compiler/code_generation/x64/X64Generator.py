@@ -53,17 +53,7 @@ class X64Generator:
         if fun_instance.entry_point:
             self.declare_globals(fun_impl)
         insts = []
-        local_vars_size = 0
-        for op in fun_impl.ops:
-            if isinstance(op, gen_codes.LdLoc):
-                off = op.local.offset() + 1
-                if off > local_vars_size:
-                    local_vars_size = off
-            elif isinstance(op, gen_codes.StLoc):
-                off = op.local.offset() + 1
-                if off > local_vars_size:
-                    local_vars_size = off
-
+        local_vars_size = fun_impl.frame_size
         dm = X64DataManager(len(fun_instance.arg_types), local_vars_size)
 
         dm.add_push_instr(insts, operand.Direct(Reg.RBP))  # Save rbp
@@ -0,0 +1,71 @@
+from typing import List
+
+from compiler.AST.spl_file import SPLFile
+from compiler.analysis.binding import BindingAnalysis, Context
+from compiler.analysis.interface import InterfaceCache
+from compiler.analysis.passes import PassManager
+from compiler.analysis.scheduling import infer_parallel
+from compiler.analysis.structure import ReturnValueChecker
+from compiler.analysis.typing import Env
+from compiler.analysis.unification import InferenceVoid
+from compiler.code_generation.generic.builtin.Add import Add
+from compiler.code_generation.generic.builtin.Eq import Eq
+from compiler.code_generation.generic.builtin.IsEmpty import IsEmpty
+from compiler.code_generation.generic.builtin.Len import Len
+from compiler.code_generation.generic.builtin.Print import Print
+from compiler.code_generation.generic.builtin.PrintLn import PrintLn
+from compiler.code_generation.generic.builtin.RefEq import RefEq
+from compiler.lexer import Lexer
+from compiler.parser import Parser, TokenReader
+from compiler.utils import InputHandler
+from compiler.walker import walk
+
+
+def builtin_functions():
+    return [Print(), PrintLn(), Eq(), RefEq(), Len(), IsEmpty(), Add()]
+
+
+# Parsing, analysis and type inference, the phases before code generation. Compiler runs them with its logging and
+# exits on errors, the tests and benchmarks run them as they are. Each phase uses jobs worker processes when jobs > 1
+class FrontEnd:
+    def __init__(self, builtins: List, jobs=1):
+        self.builtins = builtins
+        self.jobs = jobs
+
+    def parse(self, tr: TokenReader):  # The AST and the parser with the parse errors
+        parser = Parser(tr)
+        return (parser.parse_spl() if self.jobs <= 1 else parser.parse_spl_parallel(self.jobs)), parser
+
+    def parse_text(self, text: str):
+        InputHandler.set_input_text(text)
+        return self.parse(TokenReader(Lexer().iter_tokens()))
+
+    # Return value checking and binding analysis, in one traversal of the nodes. Returns both passes, with their
+    # warnings and errors, and the time taken by each
+    def analyse(self, ast: SPLFile):
+        context = Context()
+        for b in self.builtins:
+            b.add_to_context(context)
+        rvc = ReturnValueChecker()
+        binding = BindingAnalysis(context)
+        timings = PassManager([rvc, binding]).run(ast, self.jobs)
+        return rvc, binding, timings
+
+    def infer_types(self, ast: SPLFile, cache: InterfaceCache = None):  # The env after inference, raises type errors
+        env = Env()
+        for b in self.builtins:
+            b.add_to_env(env)
+        if self.jobs <= 1:
+            walk(ast.infer_type(env, InferenceVoid(), cache))
+        else:
+            infer_parallel(ast, env, self.jobs, cache)
+        return env
+
+    def run(self, text: str, cache: InterfaceCache = None):  # Parses, analyses and types text, None if there are errors
+        ast, parser = self.parse_text(text)
+        if parser.errors:
+            return None
+        rvc, binding, _ = self.analyse(ast)
+        if rvc.errors or binding.feedback['errors']:
+            return None
+        return ast, self.infer_types(ast, cache)
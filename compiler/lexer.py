@@ -1,14 +1,98 @@
 from compiler.errors import UnexpectedCharError
 from compiler.tokens import *
-from compiler.utils import CodePosition, CodeRange, InputHandler
+from compiler.utils import CodePosition, InputHandler
 import re
+import sys
+from typing import List, Optional
+
+# Matches a whole run of whitespaces, tabs, newlines, single line comments and (unterminated) multiline comments
+TRIVIA_PATTERN = re.compile(r'(?:[ \t]+|\n|//.*\n?|/\*(?:[^*]|\*(?!/))*(?:\*/)?)+')
+TRIVIA_BYTES_PATTERN = re.compile(TRIVIA_PATTERN.pattern.encode())  # For memory-mapped input
+QUOTES_PATTERN = re.compile('[\'"]')
+
+
+# Tokens of a text that is edited, see Lexer.relex. They are kept in a gap buffer with the gap at the last edit, so an
+# edit only moves the tokens between it and the previous edit. The tokens after the gap are stored with their offsets
+# minus delta, so they are not shifted either, they get their offsets when the gap moves past them
+class EditedTokens:
+    def __init__(self, tokens: List[Token]):
+        self.tokens: List[Optional[Token]] = tokens
+        self.gap = len(tokens)  # Index of the gap, the tokens before it are at their offsets
+        self.gap_size = 0
+        self.delta = 0
+        # An unterminated double quote is an unexpected token. It is the last double quote of the text, as the string
+        # pattern would match up to any later one, so there is at most one
+        text = InputHandler.input_text
+        self.open_quote = next((t.start for t in reversed(tokens) if t.token_type == TokenType.UNEXPECTED
+                                and text[t.start:t.start + 1] in ('"', b'"')), None)
+
+    def __len__(self):
+        return len(self.tokens) - self.gap_size
+
+    def start(self, i: int):
+        return self.tokens[i].start if i < self.gap else self.tokens[i + self.gap_size].start + self.delta
+
+    def end(self, i: int):
+        return self.tokens[i].end if i < self.gap else self.tokens[i + self.gap_size].end + self.delta
+
+    def get(self, i: int):  # Without its offsets if after the gap
+        return self.tokens[i] if i < self.gap else self.tokens[i + self.gap_size]
+
+    def find(self, offset: int):  # Index of the first token ending at or after offset
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.end(mid) < offset:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def same_token(self, i: int, new: Token, shift: int):
+        old = self.get(i)
+        return old.token_type == new.token_type and old.value == new.value \
+               and self.start(i) + shift == new.start and self.end(i) + shift == new.end
+
+    def move_gap(self, index: int):
+        gap, size, tokens = self.gap, self.gap_size, self.tokens
+        if size == 0 and self.delta == 0:  # Nothing to move, e.g. before the first edit
+            self.gap = index
+            return
+        if index < gap:  # The tokens the gap moves back over are moved behind it
+            moved, shift = tokens[index:gap], -self.delta
+            tokens[index + size:gap + size] = moved
+        else:
+            moved, shift = tokens[gap + size:index + size], self.delta
+            tokens[gap:index] = moved
+        for t in moved:
+            t.start += shift
+            t.end += shift
+        self.gap = index
+
+    def replace(self, first: int, last: int, new_tokens: List[Token], shift: int):  # Tokens from last on move by shift
+        self.move_gap(last)
+        self.gap_size += last - first
+        self.gap = first
+        if len(new_tokens) > self.gap_size:  # Grows in proportion to the size, so this is rare
+            grow = max(len(new_tokens), len(self.tokens) // 8)
+            self.tokens[first:first] = [None] * grow
+            self.gap_size += grow
+        self.tokens[first:first + len(new_tokens)] = new_tokens
+        self.gap += len(new_tokens)
+        self.gap_size -= len(new_tokens)
+        self.delta += shift
+
+    def __iter__(self):  # All tokens at their offsets in the current text
+        self.move_gap(len(self))
+        del self.tokens[self.gap:]
+        self.gap_size = self.delta = 0
+        return iter(self.tokens)
 
 
 class Lexer:
     def __init__(self, max_errors=5):
         self.input_text = InputHandler.input_text
         self.tokens = []
-        self.lex_position = CodePosition(1, 1)
         self.lex_errors = []
         self.lex_index = 0
         self.keywords = ['True', 'False', 'if', 'else', 'while', 'return', 'var', 'Int', 'Bool', 'Char', 'Void']
@@ -32,72 +116,118 @@ class Lexer:
             (TokenType.CHAR, r'[\'](.|([\\][n]))[\']'),  # Characters
             (TokenType.STRING, r'["]((?!["])(.|[\n]))*["]')  # String
         ]
+        # All rules combined into one pattern with a named group per rule. Alternatives are tried in order, so the
+        # first rule that matches wins, exactly like trying the rules one by one
+        self.rule_groups = {f'rule{i}': t for i, (t, r) in enumerate(self.token_match_rules)}
+        master = '|'.join([f'(?P<rule{i}>{r})' for i, (t, r) in enumerate(self.token_match_rules)])
+        self.master_str_pattern = re.compile(master)
+        self.master_bytes_pattern = re.compile(master.encode())  # For memory-mapped input
+        self.master_pattern = self.master_str_pattern
+        self.trivia_pattern = TRIVIA_PATTERN
 
-    def skip_whitespaces_comments(self):
-        remaining_input = self.get_remaining_input()
-        if len(remaining_input) == 0:
-            return
-        if m := re.match(r'[ \t]+', remaining_input):  # Skip whitespaces and tabs
-            self.increase_lex_index(m.end())
-            return self.skip_whitespaces_comments()
-        elif m := re.match(r'([\n]|(//(.*)[\n]?))', remaining_input):  # Match single line comment and newlines
-            self.increase_lex_index(m.end())
-            self.move_code_position()
-            return self.skip_whitespaces_comments()
-        elif m := re.match(r'[/][*]((?![*]/)(.|\n))*([*]/)?', remaining_input):  # Match multiline comments
-            newlines = [n.start() for n in re.finditer('\n', m.group())]
-            self.increase_lex_index(m.end())
-            self.move_code_position(line_incr=len(newlines), set_column=m.end() - (newlines[-1] if newlines else 0))
-            return self.skip_whitespaces_comments()
+    def select_patterns(self):  # Memory-mapped input is lexed as bytes, token values are decoded when created
+        if isinstance(self.input_text, str):
+            self.master_pattern, self.trivia_pattern = self.master_str_pattern, TRIVIA_PATTERN
+        else:
+            self.master_pattern, self.trivia_pattern = self.master_bytes_pattern, TRIVIA_BYTES_PATTERN
 
-    def lex_input(self):
+    def skip_whitespaces_comments(self):  # The repetition in the pattern skips all consecutive trivia in one match
+        if m := self.trivia_pattern.match(self.input_text, self.lex_index):
+            self.lex_index = m.end()
+
+    def iter_tokens(self):  # Generator yielding tokens one by one, lex errors are recorded as soon as they are found
+        self.select_patterns()
         while True:
             token: Token = self.lex_next()
-            self.tokens.append(token)
+            if token.token_type == TokenType.UNEXPECTED:
+                self.lex_errors.append(UnexpectedCharError(token.code_range, token.value))
+            yield token
             if token.token_type == TokenType.EOF:
                 break
-            elif token.token_type == TokenType.UNEXPECTED:
-                self.lex_errors.append(UnexpectedCharError(token.code_range, token.value))
-                if len(self.lex_errors) >= self.max_errors:
-                    break
+            elif token.token_type == TokenType.UNEXPECTED and len(self.lex_errors) >= self.max_errors:
+                break
+
+    def lex_input(self):
+        self.tokens.extend(self.iter_tokens())
         return self.tokens
 
+    # Re-lex after an edit of the input text. tokens are the tokens of the text before the edit and are updated in
+    # place, self.input_text must be the edited text. Only the part around the edit is lexed again, tokens after it
+    # are reused and shifted lazily (see EditedTokens), so the time only depends on the size of the edit and its
+    # distance to the previous edit
+    def relex(self, tokens: EditedTokens, offset: int, removed_length: int, inserted_text: str):
+        self.select_patterns()
+        shift = len(inserted_text) - removed_length
+        edit_end = offset + len(inserted_text)  # End of the edit in the new text
+
+        # Find the first token that can change. Matching a token looks a few characters past its end (e.g. an
+        # identifier that is extended, or a failed char literal '\n'), so tokens that end close to the edit are lexed
+        # again as well
+        first = tokens.find(offset - 4)
+        if '"' in inserted_text and tokens.open_quote is not None and tokens.open_quote < offset:
+            first = min(first, tokens.find(tokens.open_quote + 1))  # Inserting a quote can close it
+        self.lex_index = tokens.end(first - 1) if first > 0 else 0  # Last safe token boundary before the edit
+        relexed_start = self.lex_index
+
+        new_tokens = []
+        old, count = first, len(tokens)
+        while True:
+            token = self.lex_next()
+            new_tokens.append(token)
+            if token.start >= edit_end:  # Past the edit, check if the new token lines up with the old stream
+                while old < count and tokens.start(old) + shift < token.start:
+                    old += 1
+                if old < count and tokens.same_token(old, token, shift):
+                    break  # The rest of the old stream is reused
+            if token.token_type == TokenType.EOF:
+                old = count
+                break
+
+        relexed_end = tokens.end(old) if old < count else None  # In the text before the edit
+        tokens.replace(first, min(old + 1, count), new_tokens, shift)
+        if tokens.open_quote is not None and tokens.open_quote >= relexed_start:
+            tokens.open_quote = None if relexed_end is None or tokens.open_quote < relexed_end \
+                else tokens.open_quote + shift
+        for t in new_tokens:
+            if t.token_type == TokenType.UNEXPECTED and self.is_quote(t.start):
+                tokens.open_quote = t.start
+        self.lex_errors = [UnexpectedCharError(t.code_range, t.value) for t in new_tokens  # Only the re-lexed part
+                           if t.token_type == TokenType.UNEXPECTED]
+        return tokens
+
+    def is_quote(self, offset: int):
+        return self.input_text[offset:offset + 1] in ('"', b'"')
+
     def lex_next(self):
         self.skip_whitespaces_comments()
-        start_position = CodePosition.from_code_position(self.lex_position)
-        remaining_input = self.get_remaining_input()
-        if len(remaining_input) == 0:  # Done lexing
-            end_pos = CodePosition.from_code_position(self.lex_position)
-            end_pos.column+=1
-            return self.create_token(TokenType.EOF, '',
-                                     CodeRange(start_position, end_pos))
-
-        for i, (t, r) in enumerate(self.token_match_rules):
+        start = self.lex_index
+        if start >= len(self.input_text):  # Done lexing
+            return self.create_token(TokenType.EOF, '', start, start + 1)
+
+        if m := self.master_pattern.match(self.input_text, start):
+            t = self.rule_groups[m.lastgroup]
             assert isinstance(t, TokenType) or callable(t)
-            if m := re.match(r, remaining_input):
-                self.increase_lex_index(m.end())
-                code_range = CodeRange(start_position, CodePosition.from_code_position(self.lex_position))
+            self.lex_index = m.end()
+            value = self.decode(m.group())
 
-                if callable(t):  # If t is a lambda, call it with the matched string, else return t as token type
-                    return self.create_token(t(m.group()), m.group(), code_range)
-                return self.create_token(t, m.group(), code_range)
+            if callable(t):  # If t is a lambda, call it with the matched string, else return t as token type
+                return self.create_token(t(value), value, start, self.lex_index)
+            return self.create_token(t, value, start, self.lex_index)
 
         # If nothing matched, return unexpected token
-        self.increase_lex_index(1)
-        return self.create_token(TokenType.UNEXPECTED, remaining_input[0],
-                                 CodeRange(start_position, CodePosition.from_code_position(self.lex_position)))
+        self.lex_index += 1
+        return self.create_token(TokenType.UNEXPECTED, self.decode(self.input_text[start:self.lex_index]),
+                                 start, self.lex_index)
 
     @staticmethod
-    def create_token(token_type: TokenType, value: str, code_range: CodeRange):
-        return Token(token_type, re.sub("['\"]", "", value), code_range)  # Strip single/double quotes (char)
+    def decode(value):  # Input is ASCII, latin-1 keeps every byte a single character so offsets stay the same
+        return value if isinstance(value, str) else value.decode('latin-1')
 
-    def increase_lex_index(self, n):
-        self.lex_index += n
-        self.lex_position.increment_column(n)
+    @property
+    def lex_position(self):
+        return CodePosition(self.lex_index)
 
-    def get_remaining_input(self):
-        return self.input_text[self.lex_index:] if self.lex_index < len(self.input_text) else ''
-
-    def move_code_position(self, line_incr=1, set_column=1):
-        self.lex_position.increment_line(line_incr)
-        self.lex_position.set_column(set_column)
\ No newline at end of file
+    @staticmethod
+    def create_token(token_type: TokenType, value: str, start: int, end: int):
+        value = sys.intern(QUOTES_PATTERN.sub('', value))  # Strip single/double quotes (char), share equal values
+        return Token(token_type, value, start, end)
@@ -1,61 +1,54 @@
 import sys
 
-from compiler.analysis.structure import ReturnValueChecker
 from compiler.analysis.typing import Env
-from compiler.analysis.unification import InferenceVoid, Subst
 from compiler.code_generation.SSM.SSMGenerator import SSMGenerator
 from compiler.code_generation.generic.GenericGenerator import GenericGenerator
-from compiler.code_generation.generic.builtin.Add import Add
-from compiler.code_generation.generic.builtin.IsEmpty import IsEmpty
-from compiler.code_generation.generic.builtin.Len import Len
-from compiler.code_generation.generic.builtin.Print import Print
-from compiler.code_generation.generic.builtin.Eq import Eq
-from compiler.code_generation.generic.builtin.PrintLn import PrintLn
-from compiler.code_generation.generic.builtin.RefEq import RefEq
 from compiler.code_generation.x64.X64Generator import X64Generator
+from compiler.front_end import FrontEnd, builtin_functions
 from compiler.logging import Logger
 from compiler.utils import InputHandler
 from compiler.lexer import Lexer
 from compiler.parser import *
-from compiler.analysis.binding import Context
+from compiler.analysis.interface import InterfaceCache
 
 
 class Compiler:
-    def __init__(self, verbosity='debug'):
+    def __init__(self, verbosity='debug', jobs=1, cache_path: str = None):
         Logger.set_level(verbosity)
-        self.builtins = [Print(), PrintLn(), Eq(), RefEq(), Len(), IsEmpty(), Add()]
+        self.jobs = jobs  # Number of worker processes for parsing, binding analysis and type inference
+        self.cache_path = cache_path  # Interface cache file with the types of the previous compilation
+        self.builtins = builtin_functions()
+        self.front_end = FrontEnd(self.builtins, jobs)
 
     def get_builtin_str(self):
         return ', '.join([b.name for b in self.builtins])
 
+    @staticmethod
+    def stream_tokens(lexer: Lexer):
+        Logger.debug('*** Printing lexed tokens: ***')
+        for t in lexer.iter_tokens():
+            Logger.debug('{token_type}::{value}'.format(token_type=t.token_type, value=t.value))
+            if t.token_type == TokenType.UNEXPECTED:
+                Logger.error(lexer.lex_errors[-1])
+            yield t
+
     def parse_input(self, path: str):
-        f = open(path, 'r')
-        InputHandler.set_input_text(f.read())
+        InputHandler.set_input_file(path)
         Logger.info('-------------------------------------------------------------')
         Logger.info('------------------- Starting parsing phase ------------------')
         Logger.info('-------------------------------------------------------------')
         lexer = Lexer()
-        Logger.info('* Starting lexing')
-        tokens = lexer.lex_input()
-        Logger.info('- Lexing DONE')
-
-        Logger.debug('*** Printing lexed tokens: ***')
-        for i, t in enumerate(tokens):
-            Logger.debug('{token_type}::{value}'.format(token_type=t.token_type, value=t.value))
-        if len(lexer.lex_errors) > 0:
-            for e in lexer.lex_errors:
-                Logger.error(e)
+        tr = TokenReader(self.stream_tokens(lexer))  # Lexing is done lazily while parsing
+        Logger.info('* Starting lexing and parsing')
+        ast, parser = self.front_end.parse(tr)
+        Logger.info('- Lexing and parsing DONE')
+        if len(lexer.lex_errors) > 0:  # Parsing stopped at the first one, the others are reported while streaming
+            for _ in tr.tokens:
+                pass
             sys.exit(1)
-
-        tr = TokenReader(tokens)
-        parser = Parser(tr)
-        Logger.info('* Starting parsing')
-        ast = parser.parse_spl()
-        Logger.info('- Parsing DONE')
-        Logger.info('*** Pretty printing AST: ***')
-        Logger.info('\n' + ast.indented_print())
-
-        if len(parser.errors) > 0:
+        if len(parser.errors) > 0:  # Without errors the AST is printed once, after binding analysis
+            Logger.info('*** Pretty printing AST: ***')
+            Logger.info('\n' + ast.indented_print())
             for e in parser.errors:
                 Logger.error(e)
             sys.exit(1)
@@ -66,26 +59,19 @@ class Compiler:
         Logger.info('------------------ Starting analysis phase ------------------')
         Logger.info('-------------------------------------------------------------')
 
-        Logger.info('* Starting return value checking')
-        rvc = ReturnValueChecker()
-        return_warnings, return_errors = rvc.check_spl_file(ast)
-        Logger.info('- Return value checking DONE')
-        if len(return_warnings) > 0:
-            for w in return_warnings:
+        Logger.info(f'- Added {len(self.builtins)} builtin functions to binding context: {self.get_builtin_str()}')
+        Logger.info('* Starting return value checking and binding analysis')
+        rvc, binding, timings = self.front_end.analyse(ast)
+        for name, seconds in timings.items():
+            Logger.info(f'- {name[0].upper()}{name[1:]} DONE in {seconds * 1000:.1f} ms')
+        if len(rvc.warnings) > 0:
+            for w in rvc.warnings:
                 Logger.warning(w)
-        if len(return_errors) > 0:
-            for e in return_errors:
+        if len(rvc.errors) > 0:
+            for e in rvc.errors:
                 Logger.error(e)
             sys.exit(1)
-        context = Context()
-        for b in self.builtins:
-            b.add_to_context(context)
-        Logger.info(f'- Added {len(self.builtins)} builtin functions to binding context: {self.get_builtin_str()}')
-
-        binding_feedback = {'errors': [], 'warnings': []}
-        Logger.info('* Starting binding analysis')
-        ast.binding_analysis(context, binding_feedback)
-        Logger.info('- Binding analysis DONE')
+        binding_feedback = binding.feedback
 
         Logger.info('*** Pretty printing AST with identifier IDs after binding analysis: ***')
         Logger.info('\n' + ast.indented_print())
@@ -98,19 +84,18 @@ class Compiler:
                 Logger.error(e)
             sys.exit(1)
 
-        env = Env()
-        for b in self.builtins:
-            b.add_to_env(env)
         Logger.info(f'- Added {len(self.builtins)} builtin functions to type environment: {self.get_builtin_str()}')
-        subst = Subst.empty()
         Logger.info('* Starting type inference')
+        cache = None if self.cache_path is None else InterfaceCache.load(self.cache_path)
         try:
-            subst = ast.infer_type(env, InferenceVoid())
+            env = self.front_end.infer_types(ast, cache)
         except Exception as e:
             Logger.error(str(e))
             # raise e
             sys.exit(1)
-        env.substitute(subst)
+        if cache is not None:
+            Logger.info(f'- Reused the types of {cache.hits} components from interface cache {self.cache_path}')
+            cache.save(self.cache_path)
 
         Logger.debug('* Inferred function types after inference:')
         for name, f in env.functions.items():
@@ -1,37 +1,92 @@
+import gc
+import pickle
 from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
-from compiler.AST.base import Error, Text, Expr, Statement
+from compiler.AST.base import SPL, Error, Text, Expr, Statement
 from compiler.AST.spl_file import SPLFile
 from compiler.AST.declarations import FunArgNames, VarDecl, FunDecl
 from compiler.AST.expressions import BinaryOpType, UnaryOpType, Op, UnaryOp, ConstNumber, ConstChar, ConstBool, \
-    FieldExpr, EmptyList, Tuple, FunctionCall
+    ConstString, FieldExpr, EmptyList, Tuple, FunctionCall
 from compiler.AST.fields import Variable, Accessor, FieldType
 from compiler.AST.statements import Block, If, While, Assign, Return, BlockStatement, DeclWrapper, \
     ExprWrapper
 from compiler.AST.types import IntType, BoolType, CharType, TypeVarType, ListType, ValueReturn, VoidReturn, FunArgs, \
     FunctionType
-from typing import Callable, List
+from typing import Callable, List, Iterable, Iterator
 from compiler.errors import *
+from compiler.lexer import Lexer
 from compiler.logging import Logger
 from compiler.tokens import Token, TokenType
+from compiler.utils import InputHandler, fast_unpickle
+from compiler.walker import walk
 
 
-class ParseError(Exception):
+class ParseFailure:
     pass
 
 
+# Returned by a parse function that failed. The error is recorded already, the caller either passes FAILED on or
+# recovers by skipping to a synchronization token. No exceptions are used for this, so real bugs are not swallowed
+FAILED = ParseFailure()
+
+
+# Binary operators: symbol -> (operator, precedence, right associative). Higher precedence binds stronger
+binary_operators = {
+    '&&': (BinaryOpType.And, 1, False),
+    '||': (BinaryOpType.Or, 1, False),
+    '==': (BinaryOpType.Eq, 2, False),
+    '<': (BinaryOpType.Lt, 2, False),
+    '>': (BinaryOpType.Gt, 2, False),
+    '<=': (BinaryOpType.Leq, 2, False),
+    '>=': (BinaryOpType.Geq, 2, False),
+    '!=': (BinaryOpType.Neq, 2, False),
+    ':': (BinaryOpType.Cons, 3, True),
+    '%': (BinaryOpType.Mod, 4, False),
+    '+': (BinaryOpType.Add, 5, False),
+    '-': (BinaryOpType.Sub, 5, False),
+    '*': (BinaryOpType.Mul, 6, False),
+    '/': (BinaryOpType.Div, 6, False),
+}
+unary_operators = {'!': UnaryOpType.Neg, '-': UnaryOpType.Min}
+
+
 class TokenReader:
-    def __init__(self, tokens: List[Token]):
-        self.tokens: deque[Token] = deque(tokens)
+    def __init__(self, tokens: Iterable[Token]):
+        self.tokens: Iterator[Token] = iter(tokens)  # Tokens are pulled from the lexer on demand
+        self.lookahead: deque[Token] = deque()
         self.current = None
+        self.lex_error = False  # A token the lexer couldn't match was read, see pop_next
         self.pop_next()
         self.block_depth: int = 0
 
+    def next_token(self):
+        if self.lookahead:
+            return self.lookahead.popleft()
+        return next(self.tokens)
+
     def pop_next(self):
         try:
-            self.current = self.tokens.popleft()
-        except IndexError:
-            raise Exception('No tokens to pop from queue')
+            self.current = self.next_token()
+        except StopIteration:  # The lexer stopped early (too many errors), the parser sees the end of the input
+            end = self.current.end if self.current is not None else 0
+            self.current = Token(TokenType.EOF, '', end, end + 1)
+        if self.current.token_type == TokenType.UNEXPECTED:  # Lex errors are reported by the lexer, parsing stops
+            self.lex_error = True
+            self.current = Token(TokenType.EOF, '', self.current.start, self.current.start + 1)
+
+    def buffer_all(self):  # Pull all remaining tokens from the lexer, reading continues from the returned list
+        tokens = [self.current, *self.lookahead, *self.tokens]
+        self.tokens, self.lookahead = iter(tokens[1:]), deque()
+        return tokens
+
+    def peek(self, n: int = 1):  # Look n tokens past the current token, None if the stream ends before that
+        while len(self.lookahead) < n:
+            try:
+                self.lookahead.append(next(self.tokens))
+            except StopIteration:
+                return None
+        return self.lookahead[n - 1]
 
     def current_token_type(self):
         return self.current.token_type
@@ -45,7 +100,8 @@ class TokenReader:
     def read_if(self, f: Callable[[Token], bool]):
         current = self.current
         if f(current):
-            self.pop_next()
+            if current.token_type != TokenType.EOF:  # Never read past the end of the input
+                self.pop_next()
             self.check_block_depth(current)
             return current
         else:
@@ -57,11 +113,8 @@ class TokenReader:
     def read(self):
         return self.read_if(lambda t: True)
 
-    def require(self, f: Callable[[Token], bool]):
-        token = self.read_if(f)
-        if token is None:
-            raise ParseError('Unexpected token')
-        return token
+    def require(self, f: Callable[[Token], bool]):  # Same as read_if, None means the required token is missing
+        return self.read_if(f)
 
     def require_type(self, token_type: TokenType):
         return self.require(lambda t: t.token_type == token_type)
@@ -75,10 +128,13 @@ class TokenReader:
         elif current.token_type == TokenType.CURLY_CLOSE:
             self.block_depth -= 1
 
-    def move_context_up(self, depth = 1):
+    def move_context_up(self, depth = 1):  # False if the input ends before the block is closed
         current_depth = self.block_depth
         while self.block_depth > current_depth - depth:
+            if self.current_token_type() == TokenType.EOF:
+                return False
             self.read()
+        return True
 
     def skip_to(self, token: Token, including_last=False):
         while (self.current_token_type() != token.token_type or self.current_token_val() != token.value) \
@@ -92,28 +148,45 @@ class TokenReader:
 
 
 class Parser:
-    def __init__(self, token_reader: TokenReader):
+    def __init__(self, token_reader: TokenReader, max_errors=5):
         self.errors: List[ParserError] = []
         self.tr: TokenReader = token_reader
+        self.max_errors = max_errors
 
     def parse_spl(self):
         decls = []
         while self.tr.current_token_type() is not TokenType.EOF:
-            if len(self.errors) > 5:
+            if len(self.errors) > self.max_errors:
                 print('Abort parsing: too many errors')
                 break
-            try:
-                decl = self.parse_decl()
-                decls.append(decl)
-            except:
-                print(f'### Error at\n{self.tr.current_code_range()}')
+            if (decl := walk(self.parse_decl())) is FAILED:
+                if not self.tr.lex_error:
+                    print(f'### Error at\n{self.tr.current_code_range()}')
                 break
+            decls.append(decl)
+        return SPLFile(decls)
+
+    # Top level declarations are parsed independently in worker processes, see split_declarations. If any part has
+    # errors, the whole input is parsed again without workers, so errors are reported exactly as by parse_spl
+    def parse_spl_parallel(self, workers: int):
+        tokens = self.tr.buffer_all()
+        parts = split_declarations(tokens, workers * 4)
+        text = InputHandler.input_text
+        # Workers only build trees without reference cycles, so the cyclic garbage collector is disabled there
+        with ProcessPoolExecutor(workers, initializer=gc.disable) as executor:
+            results = list(executor.map(parse_part, [text[tokens[i].start:tokens[j - 1].end] for i, j in parts],
+                                        [tokens[i].start for i, j in parts]))
+        if any(result is None for result in results):
+            return self.parse_spl()
+        decls = []
+        for (i, j), result in zip(parts, results):  # Parts nested too deep to be pickled are parsed here
+            end = tokens[j - 1].end
+            decls.extend(fast_unpickle(result) if result else
+                         parse_declarations(tokens[i:j] + [Token(TokenType.EOF, '', end, end + 1)]))
         return SPLFile(decls)
 
     def parse_semicolon(self):
-        try:
-            self.tr.require_type(TokenType.SEMICOLON)
-        except:  # Assume semicolon is missing, continue parsing
+        if self.tr.require_type(TokenType.SEMICOLON) is None:  # Assume semicolon is missing, continue parsing
             self.errors.append(MissingSemicolonError(self.tr.current_code_range()))
 
     # ****************************** DECLARATIONS ******************************
@@ -125,62 +198,54 @@ class Parser:
             return self.parse_var_decl()
 
     def parse_fun_decl(self):
-        try:
-            token = self.tr.require_type(TokenType.IDENTIFIER)
-        except:
+        if (token := self.tr.require_type(TokenType.IDENTIFIER)) is None:
             self.errors.append(ExpectedIdentError(self.tr.current))
-            raise ParseError()
+            return FAILED
         name = Text(token.value).with_code_range(token.code_range)
 
         def parse_args():
             args = []
             while self.tr.current_token_type() != TokenType.PAREN_CLOSE:
-                if len(args) > 0:
-                    try:
-                        self.tr.require_type(TokenType.COMMA)
-                    except:
-                        self.errors.append(ExpectedSymbolError(',', self.tr.current))
-                        raise ParseError()
-                try:
-                    t = self.tr.require_type(TokenType.IDENTIFIER)
-                except:
+                if len(args) > 0 and self.tr.require_type(TokenType.COMMA) is None:
+                    self.errors.append(ExpectedSymbolError(',', self.tr.current))
+                    return FAILED
+                if (t := self.tr.require_type(TokenType.IDENTIFIER)) is None:
                     self.errors.append(ExpectedIdentError(self.tr.current))
-                    raise ParseError()
+                    return FAILED
                 args.append(Text(t.value).with_code_range(t.code_range))
             return FunArgNames(args)
 
-        args = self.parse_balanced_brackets(
+        args = yield self.parse_balanced_brackets(
             Token(TokenType.PAREN_OPEN, '('), parse_args, Token(TokenType.PAREN_CLOSE, ')'))
+        if args is FAILED:
+            return FAILED
         if self.tr.current_token_type() == TokenType.DOUBLECOLON:
             self.tr.read()
-            fun_type = self.parse_fun_type()
+            if (fun_type := (yield self.parse_fun_type())) is FAILED:
+                return FAILED
         else:
             fun_type = None
-        block = self.parse_block()
-        try:
-            assert isinstance(block, Error) or len(block.statements) > 0
-        except:
+        if (block := (yield self.parse_block())) is FAILED:
+            return FAILED
+        if not isinstance(block, Error) and len(block.statements) == 0:
             self.errors.append(EmptyFunctionBodyError(name.value, name.code_range))
         return FunDecl(name, args, fun_type, block, None).with_code_range(name.code_range)
 
     def parse_var_decl(self, id_token: Token = None):
-        start = self.tr.current_code_range().start if id_token is None else id_token.code_range
+        start = self.tr.current_code_range().start if id_token is None else id_token.code_range.start
         if id_token is None and (self.tr.read_if_keyword('var')) is not None:
             var_type = None
-        else:
-            var_type = self.parse_type(id_token)
-        try:
-            id_token = self.tr.require_type(TokenType.IDENTIFIER)
-            ident = Text(id_token.value).with_code_range(id_token.code_range)
-        except:
+        elif (var_type := (yield self.parse_type(id_token))) is FAILED:
+            return FAILED
+        if (id_token := self.tr.require_type(TokenType.IDENTIFIER)) is None:
             self.errors.append(ExpectedIdentError(self.tr.current))
-            raise ParseError()
-        try:
-            self.tr.require(lambda t: t.token_type == TokenType.OPERATOR and t.value == '=')
-        except:
+            return FAILED
+        ident = Text(id_token.value).with_code_range(id_token.code_range)
+        if self.tr.require(lambda t: t.token_type == TokenType.OPERATOR and t.value == '=') is None:
             self.errors.append(ExpectedSymbolError('=', self.tr.current))
-            raise ParseError()
-        expr = self.parse_expr()
+            return FAILED
+        if (expr := (yield self.parse_expr())) is FAILED or not self.spanned(expr):
+            return FAILED
         code_range = CodeRange(start, expr.code_range.end)
         self.parse_semicolon()
         return VarDecl(var_type, ident, expr).with_code_range(code_range)
@@ -190,21 +255,20 @@ class Parser:
     def parse_type(self, type_token: Token = None):
         current = self.tr.current if type_token is None else type_token
         if current.token_type == TokenType.BLOCK_OPEN:  # List type
-            return ListType(self.parse_balanced_brackets(current, self.parse_type, Token(TokenType.BLOCK_CLOSE, ']')))\
-                .with_code_range(current.code_range)
+            t = yield self.parse_balanced_brackets(current, self.parse_type, Token(TokenType.BLOCK_CLOSE, ']'))
+            return FAILED if t is FAILED else ListType(t).with_code_range(current.code_range)
         elif current.token_type == TokenType.PAREN_OPEN:  # Tuple type
             def f():
-                try:
-                    t1 = self.parse_type()
-                except:
-                    self.tr.skip_to(Token(TokenType.COMMA, ','))  # Skip to comma for error recovery
+                if (t1 := (yield self.parse_type())) is FAILED:
                     t1 = Error()
-                self.tr.require_type(TokenType.COMMA)
-                t2 = self.parse_type()
+                    self.tr.skip_to(Token(TokenType.COMMA, ','))  # Skip to comma for error recovery
+                if self.tr.require_type(TokenType.COMMA) is None or (t2 := (yield self.parse_type())) is FAILED \
+                        or not self.spanned(t1, t2):
+                    return FAILED
                 code_range = CodeRange(t1.code_range.start, t2.code_range.end)
                 return Tuple(t1, t2).with_code_range(code_range)
 
-            return self.parse_balanced_brackets(current, f, Token(TokenType.PAREN_CLOSE, ')'))
+            return (yield self.parse_balanced_brackets(current, f, Token(TokenType.PAREN_CLOSE, ')')))
         elif current.token_type == TokenType.IDENTIFIER:  # Type var
             if type_token is None:
                 self.tr.read()
@@ -223,24 +287,23 @@ class Parser:
             if t is not None:
                 return t.with_code_range(current.code_range)
         self.errors.append(ExpectedTypeError(current))
-        raise ParseError()
+        return FAILED
 
     def parse_fun_type(self):
         start = self.tr.current_code_range().start
         args = []
-        try:
-            while self.tr.current_token_type() != TokenType.ARROW:
-                args.append(self.parse_type())
-        except:
-            args.append(Error())
-            current = self.tr.current
-            self.tr.skip_to(Token(TokenType.ARROW, '->'))  # when error, try skipping to arrow and continue parse
-        try:
-            self.tr.require_type(TokenType.ARROW)
-        except:
+        current = self.tr.current
+        while self.tr.current_token_type() != TokenType.ARROW:
+            if (t := (yield self.parse_type())) is FAILED:
+                args.append(Error())
+                current = self.tr.current
+                self.tr.skip_to(Token(TokenType.ARROW, '->'))  # when error, try skipping to arrow and continue parse
+                break
+            args.append(t)
+        if self.tr.require_type(TokenType.ARROW) is None:
             self.errors.append(ExpectedSymbolError('->', current))
-            raise ParseError()
-        return_type = self.parse_return_type()
+            return FAILED
+        return_type = yield self.parse_return_type()
         code_range = CodeRange(start, self.tr.current_code_range().end)
         return FunctionType(FunArgs(args), return_type).with_code_range(code_range)
 
@@ -250,9 +313,7 @@ class Parser:
             self.tr.read()
             return VoidReturn().with_code_range(current.code_range)
         else:
-            try:
-                t = self.parse_type()
-            except:
+            if (t := (yield self.parse_type())) is FAILED:
                 t = Error()
                 self.tr.skip_to(Token(TokenType.CURLY_OPEN, '{'))  # try skipping to { and continue parsing
             return ValueReturn(t).with_code_range(CodeRange(current.code_range.start, self.tr.current_code_range().end))
@@ -269,28 +330,33 @@ class Parser:
             elif current.value == 'while':
                 return self.parse_while()
             elif current.value in ['var', 'Bool', 'Int', 'Char']:
-                var_decl = self.parse_var_decl()
-                return DeclWrapper(var_decl).with_code_range(var_decl.code_range)
+                return self.parse_var_decl_statement()
         if current.token_type in [TokenType.BLOCK_OPEN, TokenType.PAREN_OPEN]:
-            var_decl = self.parse_var_decl()
-            return DeclWrapper(var_decl).with_code_range(var_decl.code_range)
+            return self.parse_var_decl_statement()
         elif current.token_type == TokenType.IDENTIFIER:
             return self.parse_identifier_statement()
         elif current.token_type == TokenType.CURLY_OPEN:
-            block = self.parse_block()
-            code_range = CodeRange(current.code_range.start, self.tr.current_code_range().end)
-            return BlockStatement(block).with_code_range(code_range)
+            return self.parse_block_statement()
         else:
             self.errors.append(ExpectedStatementError(current))
-            raise ParseError()
+            return FAILED
+
+    def parse_block_statement(self):
+        start = self.tr.current_code_range().start
+        if (block := (yield self.parse_block())) is FAILED:
+            return FAILED
+        return BlockStatement(block).with_code_range(CodeRange(start, self.tr.current_code_range().end))
+
+    def parse_var_decl_statement(self):
+        if (var_decl := (yield self.parse_var_decl())) is FAILED:
+            return FAILED
+        return DeclWrapper(var_decl).with_code_range(var_decl.code_range)
 
     def parse_return(self):
         t = self.tr.require_keyword('return')
         expr = None
         if self.tr.current_token_type() != TokenType.SEMICOLON:
-            try:
-                expr = self.parse_expr()
-            except:
+            if (expr := (yield self.parse_expr())) is FAILED:
                 expr = Error()
                 self.tr.skip_to_semicolon()  # Skip to ; for error recovery and continue parsing
         code_range = CodeRange(t.code_range.start, self.tr.current_code_range().end)
@@ -299,48 +365,54 @@ class Parser:
 
     def parse_if(self):
         t = self.tr.require_keyword('if')
-        condition = self.parse_bracketed_expr(allow_tuple=False)  # Error is handled in parse_bracketed_expr
-        then_block = self.parse_block()  # Error is handled in parse_block
+        if (condition := (yield self.parse_bracketed_expr(allow_tuple=False))) is FAILED \
+                or (then_block := (yield self.parse_block())) is FAILED:
+            return FAILED
         else_block = None
-        if self.tr.read_if_keyword('else') is not None:
-            else_block = self.parse_block()
+        if self.tr.read_if_keyword('else') is not None and (else_block := (yield self.parse_block())) is FAILED:
+            return FAILED
         code_range = CodeRange(t.code_range.start, self.tr.current_code_range().end)
         return If(condition, then_block, else_block).with_code_range(code_range)
 
     def parse_while(self):
         t = self.tr.require_keyword('while')
-        condition = self.parse_bracketed_expr(allow_tuple=False)
-        body = self.parse_block()
+        if (condition := (yield self.parse_bracketed_expr(allow_tuple=False))) is FAILED \
+                or (body := (yield self.parse_block())) is FAILED:
+            return FAILED
         code_range = CodeRange(t.code_range.start, self.tr.current_code_range().end)
         return While(condition, body).with_code_range(code_range)
 
     def parse_identifier_statement(self):
         id_token = self.tr.require_type(TokenType.IDENTIFIER)
         if self.tr.current_token_type() == TokenType.PAREN_OPEN:  # Functional call
-            call = self.parse_function_call(id_token)
+            if (call := (yield self.parse_function_call(id_token))) is FAILED:
+                return FAILED
             self.parse_semicolon()
             return ExprWrapper(call).with_code_range(call.code_range)
         elif self.tr.current_token_type() in [TokenType.DOT, TokenType.OPERATOR]:  # Assignment
             base_field = Variable(id_token.value).with_code_range(id_token.code_range)
-            field = self.parse_field_accessor(base_field)
-            try:
-                op = self.tr.require(lambda t: t.token_type == TokenType.OPERATOR and t.value == '=')
-            except:
+            if (field := self.parse_field_accessor(base_field)) is FAILED:
+                return FAILED
+            if self.tr.require(lambda t: t.token_type == TokenType.OPERATOR and t.value == '=') is None:
                 self.errors.append(ExpectedSymbolError('=', self.tr.current))
-                raise ParseError()
-            expr = self.parse_expr()
+                return FAILED
+            if (expr := (yield self.parse_expr())) is FAILED:
+                return FAILED
             self.parse_semicolon()
             code_range = CodeRange(id_token.code_range.start, self.tr.current_code_range().end)
             return Assign(field, expr).with_code_range(code_range)
         else:  # Var declaration with type var
-            return DeclWrapper(self.parse_var_decl(id_token)).with_code_range(id_token.code_range)
+            if (var_decl := (yield self.parse_var_decl(id_token))) is FAILED:
+                return FAILED
+            return DeclWrapper(var_decl).with_code_range(id_token.code_range)
 
     def parse_block(self):  # TODO order of var decls and stmts
         def f():
             start_range = self.tr.current_code_range()
             statements = []
             while self.tr.current_token_type() != TokenType.CURLY_CLOSE:
-                stmt = self.parse_statement()
+                if (stmt := (yield self.parse_statement())) is FAILED:
+                    return FAILED
                 statements.append(stmt)
             code_range = CodeRange(start_range.start, self.tr.current_code_range().end)
             return Block(statements).with_code_range(code_range)
@@ -348,73 +420,38 @@ class Parser:
         return self.parse_balanced_brackets(Token(TokenType.CURLY_OPEN, '{'), f, Token(TokenType.CURLY_CLOSE, '}'))
 
     # ****************************** EXPRESSIONS ******************************
-    def parse_bin_op_expr(self, get_op: Callable, parse_next: Callable):
-        result = parse_next()
+    def parse_expr(self, min_precedence: int = 1):  # Precedence climbing over the binary operator table
+        if (result := (yield self.parse_unary_op())) is FAILED:
+            return FAILED
         while self.tr.current_token_type() == TokenType.OPERATOR and \
-                isinstance(op := get_op(self.tr.current_token_val()), BinaryOpType):
+                (op := binary_operators.get(self.tr.current_token_val())) is not None:
+            op_type, precedence, right_assoc = op
+            if precedence < min_precedence:
+                break
             self.tr.read()
-            rhs = parse_next()
+            if (rhs := (yield self.parse_expr(precedence if right_assoc else precedence + 1))) is FAILED \
+                    or not self.spanned(result, rhs):
+                return FAILED
             code_range = CodeRange(result.code_range.start, rhs.code_range.end)
-            result = Op(result, op, rhs).with_code_range(code_range)
+            result = Op(result, op_type, rhs).with_code_range(code_range)
         return result
 
-    def parse_expr(self):
-        return self.parse_bool_expr()
-
-    def parse_bool_expr(self):
-        return self.parse_bin_op_expr(
-            lambda sym: {'&&': BinaryOpType.And, '||': BinaryOpType.Or}.get(sym, None),
-            self.parse_comp_expr
-        )
-
-    def parse_comp_expr(self):
-        return self.parse_bin_op_expr(
-            lambda sym: {
-                '==': BinaryOpType.Eq,
-                '<': BinaryOpType.Lt,
-                '>': BinaryOpType.Gt,
-                '<=': BinaryOpType.Leq,
-                '>=': BinaryOpType.Geq,
-                '!=': BinaryOpType.Neq,
-            }.get(sym, None),
-            self.parse_list_expr
-        )
-
-    def parse_list_expr(self):
-        lhs = self.parse_mod_expr()
-        if self.tr.read_if(lambda t: t.token_type == TokenType.OPERATOR and t.value == ':') is not None:
-            rhs = self.parse_list_expr()
-            code_range = CodeRange(lhs.code_range.start, rhs.code_range.end)
-            return Op(lhs, BinaryOpType.Cons, rhs).with_code_range(code_range)
-        return lhs
-
-    def parse_mod_expr(self):
-        return self.parse_bin_op_expr(
-            lambda sym: {'%': BinaryOpType.Mod}.get(sym, None),
-            self.parse_sum
-        )
-
-    def parse_sum(self):
-        return self.parse_bin_op_expr(
-            lambda sym: {'+': BinaryOpType.Add, '-': BinaryOpType.Sub}.get(sym, None),
-            self.parse_product
-        )
-
-    def parse_product(self):
-        return self.parse_bin_op_expr(
-            lambda sym: {'*': BinaryOpType.Mul, '/': BinaryOpType.Div}.get(sym, None),
-            self.parse_unary_op
-        )
-
     def parse_unary_op(self):
-        ops = {'!': UnaryOpType.Neg, '-': UnaryOpType.Min}
-        if isinstance(op := ops.get(self.tr.current_token_val(), None), UnaryOpType):
-            start = self.tr.current.code_range.start
+        if self.tr.current_token_val() not in unary_operators:  # Most operands have no unary operator
+            return self.parse_term()
+        return self.parse_unary_ops()
+
+    def parse_unary_ops(self):
+        ops = []
+        while isinstance(op := unary_operators.get(self.tr.current_token_val(), None), UnaryOpType):
+            ops.append((op, self.tr.current.code_range.start))
             self.tr.read()
-            rhs = self.parse_unary_op()
-            code_range = CodeRange(start, rhs.code_range.end)
-            return UnaryOp(op, rhs).with_code_range(code_range)
-        return self.parse_term()
+        if (result := (yield self.parse_term())) is FAILED or (ops and not self.spanned(result)):
+            return FAILED
+        for op, start in reversed(ops):  # Innermost operator is applied first
+            code_range = CodeRange(start, result.code_range.end)
+            result = UnaryOp(op, result).with_code_range(code_range)
+        return result
 
     # PARSE TERMS
 
@@ -423,7 +460,8 @@ class Parser:
         if self.tr.current_token_type() == TokenType.PAREN_OPEN:
             return self.parse_function_call(token)
         base_field = Variable(token.value).with_code_range(token.code_range)
-        field = self.parse_field_accessor(base_field)
+        if (field := self.parse_field_accessor(base_field)) is FAILED:
+            return FAILED
         code_range = CodeRange(token.code_range.start, field.code_range.end)
         return FieldExpr(field).with_code_range(code_range)
 
@@ -431,11 +469,9 @@ class Parser:
         field = base_field
         while self.tr.current_token_type() == TokenType.DOT:
             dot = self.tr.require_type(TokenType.DOT)
-            try:
-                id = self.tr.require_type(TokenType.IDENTIFIER)
-            except:
+            if (id := self.tr.require_type(TokenType.IDENTIFIER)) is None:
                 self.errors.append(ExpectedIdentError(self.tr.current))
-                raise ParseError()
+                return FAILED
             if id.value == 'fst':
                 kind = FieldType.Fst
             elif id.value == 'snd':
@@ -446,7 +482,7 @@ class Parser:
                 kind = FieldType.Tl
             else:
                 self.errors.append(UnknownFieldError(id.value, id.code_range))
-                raise ParseError()
+                return FAILED
             field = Accessor(kind, field).with_code_range(id.code_range)
         return field
 
@@ -454,13 +490,12 @@ class Parser:
         def f():
             fargs = []
             while self.tr.current_token_type() != TokenType.PAREN_CLOSE:
-                if len(fargs) > 0:
-                    try:
-                        self.tr.require_type(TokenType.COMMA)
-                    except Exception as e:
-                        self.errors.append(ExpectedSymbolError(',', self.tr.current))
-                        raise e
-                fargs.append(self.parse_expr())
+                if len(fargs) > 0 and self.tr.require_type(TokenType.COMMA) is None:
+                    self.errors.append(ExpectedSymbolError(',', self.tr.current))
+                    return FAILED
+                if (arg := (yield self.parse_expr())) is FAILED:
+                    return FAILED
+                fargs.append(arg)
             return FunctionCall(Text(id_token.value), fargs).with_code_range(id_token.code_range)
 
         return self.parse_balanced_brackets(
@@ -475,13 +510,15 @@ class Parser:
         #     return ConstNumber(num).with_code_range(token.code_range)
         # else:
         #     self.errors.append(NumberOverflowError(token))
-        #     raise ParseError()
+        #     return FAILED
 
     def parse_bracketed_expr(self, allow_tuple: bool = True):
         def f():
-            expr = self.parse_expr()
+            if (expr := (yield self.parse_expr())) is FAILED:
+                return FAILED
             if allow_tuple and self.tr.read_if(lambda t: t.token_type == TokenType.COMMA):
-                expr2 = self.parse_expr()
+                if (expr2 := (yield self.parse_expr())) is FAILED or not self.spanned(expr, expr2):
+                    return FAILED
                 code_range = CodeRange(expr.code_range.start, expr2.code_range.end)
                 return Tuple(expr, expr2).with_code_range(code_range)
             return expr
@@ -489,13 +526,10 @@ class Parser:
         return self.parse_balanced_brackets(
             Token(TokenType.PAREN_OPEN, '('), f, Token(TokenType.PAREN_CLOSE, ')'))
 
-    def parse_string(self, string: str, code_range: CodeRange):
-        # return Op(lhs, BinaryOpType.Cons, rhs).with_code_range(code_range)
+    def parse_string(self, string: str, code_range: CodeRange):  # One node for the whole string, typed as [Char]
         if len(string) == 0:
             return EmptyList().with_code_range(code_range)
-        else:
-            return Op(ConstChar(string[0]), BinaryOpType.Cons, self.parse_string(string[1:], code_range))\
-                .with_code_range(code_range)
+        return ConstString(string).with_code_range(code_range)
 
     def parse_term(self) -> Expr:
         tr = self.tr
@@ -519,43 +553,82 @@ class Parser:
             return self.parse_bracketed_expr()
         elif current.token_type == TokenType.BLOCK_OPEN:  # Empty list
             tr.read()
-            try:
-                close = tr.require_type(TokenType.BLOCK_CLOSE)
-            except:
-                close = tr.current
-                self.errors.append(ExpectedSymbolError(']', close))
-                raise ParseError()
+            if (close := tr.require_type(TokenType.BLOCK_CLOSE)) is None:
+                self.errors.append(ExpectedSymbolError(']', tr.current))
+                return FAILED
             code_range = CodeRange(current.code_range.start, close.code_range.end)
             return EmptyList().with_code_range(code_range)
         else:
             self.errors.append(ExpectedTermError(current))
-            raise ParseError()
+            return FAILED
+
+    # A placeholder Error for a part that failed to parse has no code range, so a node spanning it can't be built. Then
+    # the enclosing node fails as well, and recovery continues at the enclosing brackets or block
+    @staticmethod
+    def spanned(*nodes: SPL):
+        return all(node.span is not None for node in nodes)
 
+    # Panic mode recovery: when f fails, skip to the closing bracket (or out of the block) and continue from there
     def parse_balanced_brackets(self, start: Token, f: Callable, end: Token):
-        try:
-            t1 = self.tr.require_type(start.token_type)
-        except:
+        if (t1 := self.tr.require_type(start.token_type)) is None:
             self.errors.append(ExpectedSymbolError(start.value, self.tr.current))
-            raise ParseError()
-        try:
-            result = f()
-        except RecursionError:
-            Logger.debug(f"Recursion error caught parsing from {start.value} to {end.value}")
-            result = Error()
-            self.errors.append(TooManyBracketsError(t1))
+            return FAILED
+        result = yield f()
+        if result is FAILED:  # If it's a block, try moving one context up, otherwise try to find closing bracket
+            Logger.debug(f"Parse error from {start.value} to {end.value}, skipping to closing bracket")
+            if end.token_type == TokenType.CURLY_CLOSE:
+                if not self.tr.move_context_up():  # Input ended inside the block, nothing left to recover
+                    return FAILED
+                return Error().with_code_range(CodeRange(t1.code_range.start, self.tr.current_code_range().end))
             self.tr.skip_to(end)
-        except Exception as e:  # if it's a block, try moving one context up, otherwise try to find closing bracket
-            Logger.debug(f"Exception caught parsing from {start.value} to {end.value}, skipping to closing bracket: {e}")
             result = Error()
-            if end.token_type == TokenType.CURLY_CLOSE:
-                self.tr.move_context_up()
-                return result.with_code_range(CodeRange(t1.code_range.start, self.tr.current_code_range()))
-            else:
-                self.tr.skip_to(end)
-        try:
-            t2 = self.tr.require_type(end.token_type)
-            # code_range = CodeRange(t1.code_range.start, t2.code_range.end)
-            return result
-        except:
+        if self.tr.require_type(end.token_type) is None:
             self.errors.append(UnbalancedBracketsError(start, end, t1.code_range, self.tr.current_code_range()))
-            raise ParseError()
+            return FAILED
+        return result
+
+
+# Split tokens at top level declaration boundaries into about n parts of similar size, as (first, last + 1) indices.
+# A declaration ends with the '}' that closes its outermost block, or with a ';' outside of blocks
+def split_declarations(tokens: List[Token], n: int):
+    size = len(tokens) // n + 1
+    parts = []
+    start, depth = 0, 0
+    for i, t in enumerate(tokens):
+        if t.token_type == TokenType.CURLY_OPEN:
+            depth += 1
+        elif t.token_type == TokenType.CURLY_CLOSE:
+            depth -= 1
+        elif t.token_type != TokenType.SEMICOLON or depth != 0:
+            continue
+        if depth == 0 and i + 1 - start >= size and i + 1 < len(tokens):
+            parts.append((start, i + 1))
+            start = i + 1
+    parts.append((start, len(tokens)))
+    return parts
+
+
+def parse_declarations(tokens: List[Token]):  # None if there are parse errors
+    parser = Parser(TokenReader(tokens))
+    decls = []
+    while parser.tr.current_token_type() is not TokenType.EOF:
+        if (decl := walk(parser.parse_decl())) is FAILED or len(parser.errors) > 0:
+            return None
+        decls.append(decl)
+    return decls
+
+
+# Runs in a worker process. The part of the input text is lexed again here, sending the text is much cheaper than
+# sending the tokens. Returns the pickled declarations, None if there are errors
+def parse_part(text, offset: int):
+    InputHandler.set_input_text(text)
+    tokens = Lexer().lex_input()
+    for t in tokens:  # Offsets in the whole input
+        t.start += offset
+        t.end += offset
+    if (decls := parse_declarations(tokens)) is None:
+        return None
+    try:
+        return pickle.dumps(decls)
+    except RecursionError:  # Deeply nested expression, empty result so the part is parsed by the main process
+        return b''
@@ -1,5 +1,5 @@
 from enum import Enum, auto
-from compiler.utils import CodeRange
+from compiler.utils import CodeRange, CodePosition
 
 
 class TokenType(Enum):
@@ -25,7 +25,19 @@ class TokenType(Enum):
 
 
 class Token:
-    def __init__(self, token_type: TokenType, value: str, code_range: CodeRange = None):
+    __slots__ = ('token_type', 'value', 'start', 'end')
+
+    def __init__(self, token_type: TokenType, value: str, start: int = None, end: int = None):
         self.token_type = token_type
         self.value = value
-        self.code_range = code_range
\ No newline at end of file
+        self.start = start  # Offsets in the input text, positions are only created when a code range is requested
+        self.end = end
+
+    def __reduce__(self):  # Pickled as constructor call, much faster than the default for slotted classes
+        return Token, (self.token_type, self.value, self.start, self.end)
+
+    @property
+    def code_range(self):
+        if self.start is None:
+            return None
+        return CodeRange(CodePosition(self.start), CodePosition(self.end))
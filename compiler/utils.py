@@ -1,48 +1,93 @@
+import gc
+import mmap
+import pickle
+from array import array
+from bisect import bisect_right
+
+
 class InputHandler:
-    input_text = ""
-    lines = []
+    input_text = ""  # Either a str or a memory-mapped (ASCII) input file
+    line_starts = None  # Offset of the first character of each line, built on first use (error reporting)
 
     @classmethod
     def set_input_text(cls, input_text):
         cls.input_text = input_text
-        cls.lines = ''.join(input_text).split('\n')
+        cls.line_starts = None
+
+    @classmethod
+    def set_input_file(cls, path: str):  # Map the file into memory instead of reading it into a str
+        with open(path, 'rb') as f:
+            try:
+                cls.set_input_text(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            except ValueError:  # Empty files cannot be mapped
+                cls.set_input_text('')
+
+    @classmethod
+    def get_line_starts(cls):
+        if cls.line_starts is None:
+            text = cls.input_text
+            newline = '\n' if isinstance(text, str) else b'\n'
+            cls.line_starts = array('q', [0])
+            i = text.find(newline)
+            while i >= 0:
+                cls.line_starts.append(i + 1)
+                i = text.find(newline, i + 1)
+        return cls.line_starts
 
     @classmethod
     def get_line(cls, number: int):
-        length = len(cls.lines)
-        if length < 1:
-            return ''
-        if number <= 1:
-            return cls.lines[0]
-        if number > length:
-            return cls.lines[length - 1]
-        return cls.lines[number - 1]
+        line_starts = cls.get_line_starts()
+        number = min(max(number, 1), len(line_starts))
+        start = line_starts[number - 1]
+        end = line_starts[number] - 1 if number < len(line_starts) else len(cls.input_text)
+        line = cls.input_text[start:end]
+        return line if isinstance(line, str) else line.decode('latin-1')
+
+    @classmethod
+    def get_line_number(cls, offset: int):
+        return bisect_right(cls.get_line_starts(), offset)
 
+    @classmethod
+    def get_column(cls, offset: int, line: int):
+        return offset - cls.get_line_starts()[line - 1] + 1
 
+
+# Position in the input text, stored as an offset. Line and column are only resolved when needed (error reporting)
 class CodePosition:
-    def __init__(self, line, column):
-        self.line = line
-        self.column = column
+    __slots__ = ('offset',)
 
-    @classmethod
-    def from_code_position(cls, position):
-        return cls(position.line, position.column)
+    def __init__(self, offset: int):
+        self.offset = offset
 
-    def increment_line(self, n=1):
-        self.line += n
+    def __reduce__(self):  # Pickled as constructor call, much faster than the default for slotted classes
+        return CodePosition, (self.offset,)
 
-    def increment_column(self, n=1):
-        self.column += n
+    @property
+    def line(self):
+        return InputHandler.get_line_number(self.offset)
 
-    def set_column(self, n):
-        self.column = n
+    @property
+    def column(self):
+        return InputHandler.get_column(self.offset, self.line)
 
 
 class CodeRange:
+    __slots__ = ('start', 'end')
+
     def __init__(self, start: CodePosition, end: CodePosition):
         self.start = start
         self.end = end
 
+    def __reduce__(self):
+        return CodeRange, (self.start, self.end)
+
+    def pack(self):  # Start and end offset in one int, offsets are below 2^32
+        return self.start.offset << 32 | self.end.offset
+
+    @staticmethod
+    def unpack(span: int):
+        return CodeRange(CodePosition(span >> 32), CodePosition(span & 0xFFFFFFFF))
+
     def __str__(self):
         arrows = ''.join(['^' for x in range(self.end.column - self.start.column)])
         line_and_col_str = '{line}:{col}: '.format(line=self.start.line, col=self.start.column)
@@ -50,6 +95,18 @@ class CodeRange:
                + '\n' + (''.join([' ' for x in range(len(line_and_col_str) + self.start.column - 1)])) + arrows
 
 
+# Unpickling creates many objects at once, collecting them repeatedly is only overhead. The results of worker processes
+# and cache entries are unpickled with the cyclic garbage collector disabled
+def fast_unpickle(data: bytes):
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return pickle.loads(data)
+    finally:
+        if enabled:
+            gc.enable()
+
+
 class Colors:
     HEADER = '\033[95m'
     OKBLUE = '\033[94m'
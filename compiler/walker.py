@@ -0,0 +1,35 @@
+from types import GeneratorType
+
+
+# Runs a recursive pass over the AST (or the parser) without using the Python call stack, so the nesting depth of a
+# program is only limited by memory. Recursive methods are written as generators: instead of calling a child method
+# directly, they yield the call and receive its result, e.g. star = yield self.expr.infer_type(env, sigma)
+# Methods that do not recurse can stay plain functions, a yielded value that is not a generator is sent back as is.
+# Exceptions are raised inside the yielding generator, so try/except around a yield works like around a call
+def walk(step):
+    if type(step) is not GeneratorType:
+        return step
+    stack = []
+    push, pop = stack.append, stack.pop
+    value, error = None, None
+    while True:
+        try:
+            if error is None:
+                child = step.send(value)
+            else:
+                child, error = step.throw(error), None
+        except StopIteration as e:
+            if not stack:
+                return e.value
+            step, value, error = pop(), e.value, None
+            continue
+        except BaseException as e:
+            if not stack:
+                raise
+            step, error = pop(), e
+            continue
+        if type(child) is GeneratorType:
+            push(step)
+            step, value = child, None
+        else:
+            value = child
@@ -12,10 +12,15 @@ parser.add_argument('-i', '--input', required=True, type=str, nargs=1, help='SPL
 parser.add_argument('-o', '--output', type=str, nargs=1, help='Output file', default=[f'{os.getcwd()}/out'])
 parser.add_argument('-v', '--verbosity', type=str, nargs=1, help='Verbosity level', default=['info'],
                     choices=['debug', 'info', 'warning', 'error'])
+parser.add_argument('-j', '--jobs', type=int, nargs=1, default=[1],
+                    help='Number of worker processes for parsing, binding analysis and type inference')
+parser.add_argument('-c', '--cache', type=str, nargs=1, default=[None],
+                    help='Interface cache file, types of unchanged functions are reused from the previous compilation')
 
 
-args = parser.parse_args()
+if __name__ == '__main__':  # Guarded, worker processes for parsing may import this module
+    args = parser.parse_args()
 
-compiler = Compiler(args.verbosity[0])
-print(f'Starting SPL compiler version {version}')
-compiler.compile(args.input[0], args.target[0], args.output[0])
+    compiler = Compiler(args.verbosity[0], args.jobs[0], args.cache[0])
+    print(f'Starting SPL compiler version {version}')
+    compiler.compile(args.input[0], args.target[0], args.output[0])
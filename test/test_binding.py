@@ -0,0 +1,42 @@
+import unittest
+
+from compiler.analysis.binding import Context, ScopeKind
+
+
+class ContextTests(unittest.TestCase):
+    def test_shadowing(self):
+        context = Context()
+        context.push_scope()
+        x = context.add_variable('x')
+        context.push_scope()
+        self.assertIsNone(context.get_variable_current_scope('x'), 'Outer variable is not in the current scope')
+        inner = context.add_variable('x')
+        t = context.get_or_add_type('t')
+        self.assertEqual(context.get_variable('x'), inner, 'Inner variable should hide the outer one')
+        self.assertEqual(context.get_or_add_type('t'), t, 'Type variable should be reused in its scope')
+        context.pop_scope()
+        self.assertEqual(context.get_variable('x'), x, 'Outer variable should be visible again')
+        self.assertEqual(context.get_variable_current_scope('x'), x)
+        self.assertFalse(context.has_type('t'), 'Type variable should be gone with its scope')
+        context.pop_scope()
+        self.assertIsNone(context.get_variable('x'))
+        self.assertEqual(context.collect_variables(), [])
+
+    def test_storage(self):
+        context = Context()
+        context.push_scope()
+        g = context.add_variable('g')
+        context.begin_frame(2)
+        context.push_scope()
+        a = context.add_variable('a', -2)
+        b = context.add_variable('b', -1)
+        x = context.add_variable('x')
+        context.push_scope()
+        y = context.add_variable('y')
+        context.pop_scope()
+        context.pop_scope()
+        self.assertEqual(context.end_frame(), 4, 'Frame should hold the locals after the argument slots')
+        h = context.add_variable('h')
+        self.assertEqual([context.get_storage(v) for v in (g, a, b, x, y, h)],
+                         [(ScopeKind.Global, 0), (ScopeKind.Local, -2), (ScopeKind.Local, -1), (ScopeKind.Local, 2),
+                          (ScopeKind.Local, 3), (ScopeKind.Global, 1)])
@@ -0,0 +1,58 @@
+import unittest
+
+from compiler.analysis.binding import BindingAnalysis, Context
+from compiler.analysis.passes import PassManager
+from compiler.analysis.structure import ReturnValueChecker
+from compiler.analysis.typing import Env
+from compiler.analysis.unification import InferenceVoid
+from compiler.code_generation.generic.GenericGenerator import GenericGenerator
+from compiler.lexer import Lexer
+from compiler.parser import Parser, TokenReader
+from compiler.utils import InputHandler
+from compiler.walker import walk
+
+DEPTH = 100000
+
+
+# Nesting this deep would overflow the interpreter stack if the parser or any AST pass used recursive calls
+class DeepNestingTests(unittest.TestCase):
+    def parse(self, program: str):
+        InputHandler.set_input_text(program)
+        parser = Parser(TokenReader(Lexer().iter_tokens()))
+        ast = parser.parse_spl()
+        self.assertEqual(len(parser.errors), 0, 'Program should parse without errors')
+        return ast
+
+    def compile(self, program: str):
+        ast = self.parse(program)
+        binding = BindingAnalysis(Context())
+        PassManager([binding]).run(ast)
+        self.assertEqual(len(binding.feedback['errors']), 0, 'Binding analysis should not give errors')
+        warnings, errors = ReturnValueChecker().check_spl_file(ast)
+        self.assertEqual(len(errors), 0, 'Return value check should not give errors')
+        env = Env()
+        walk(ast.infer_type(env, InferenceVoid()))
+        return ast, GenericGenerator(ast, env, []).generate()
+
+    def test_deep_brackets(self):
+        ast, functions = self.compile('main() :: -> Void { var x = ' + '(' * DEPTH + '1' + ')' * DEPTH + '; }')
+        self.assertEqual(ast.pretty_print(), 'main() :: -> Void\n{\n    var x[ 0 ] = 1;\n}\n\n \n')
+
+    def test_deep_binary_ops(self):
+        ast, functions = self.compile('main() :: -> Void { var x = 1' + ' - 2 * 3' * DEPTH + '; }')
+        self.assertTrue(ast.pretty_print().startswith('main() :: -> Void\n{\n    var x[ 0 ] = ' + '(' * DEPTH))
+
+    def test_deep_unary_ops(self):
+        ast, functions = self.compile('main() :: -> Void { var x = ' + '-' * DEPTH + '1; var y = ' + '!' * DEPTH +
+                                      'True; }')
+        self.assertIn('(-' * DEPTH + '1' + ')' * DEPTH, ast.pretty_print())
+
+    def test_deep_cons(self):  # Right associative, the parser nests the right operand
+        ast = self.parse('main() :: -> Void { var x = 1' + ' : 1' * DEPTH + ' : []; }')
+        self.assertIn('(1 : ' * DEPTH, ast.pretty_print())
+
+    def test_deep_blocks(self):  # Blocks nest scopes and the indentation grows with the depth, so not as deep
+        depth = DEPTH // 50
+        ast, functions = self.compile('main() :: -> Void { var x = 1; ' + 'if (True) { x = x - 1; ' * depth +
+                                      '}' * depth + ' }')
+        self.assertEqual(ast.pretty_print().count('if(True)'), depth)
@@ -0,0 +1,55 @@
+import os
+import tempfile
+import unittest
+
+from compiler.analysis.interface import InterfaceCache
+from compiler.code_generation.SSM.SSMGenerator import SSMGenerator
+from compiler.code_generation.generic.GenericGenerator import GenericGenerator
+from compiler.code_generation.generic.builtin.IsEmpty import IsEmpty
+from compiler.code_generation.generic.builtin.Print import Print
+from compiler.front_end import FrontEnd
+
+program = '''
+var g = 1;
+id(x) { return x; }
+''' + ''.join(f'''
+f{i}(x, xs) {{
+    var l = id(x) : xs;
+    if (isEmpty(xs)) {{ return (l, g + {i}); }}
+    return f{i}(x, xs.tl);
+}}
+''' for i in range(12)) + '''
+even(n) { if (n == 0) { return True; } return odd(n - 1); }
+odd(n) { if (n == 0) { return False; } return even(n - 1); }
+main() { print(f3(1, [])); print(even(4)); }
+'''
+
+
+class InterfaceCacheTests(unittest.TestCase):
+    @staticmethod
+    def compile(text, cache=None, workers=1):  # SSM code of the program
+        builtins = [Print(), IsEmpty()]
+        ast, env = FrontEnd(builtins, workers).run(text, cache)
+        ssm = SSMGenerator(GenericGenerator(ast, env, builtins).generate())
+        return [str(op) for ops in ssm.generate() for op in ops]
+
+    def test_reuse(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'program.spli')
+            self.compile(program, cache := InterfaceCache.load(path))
+            cache.save(path)
+            self.assertEqual(cache.hits, 0)
+            changed = program.replace('print(even(4));', 'print(even(5)); print(f7(True, []));')
+            for workers in [1, 2]:
+                cache = InterfaceCache.load(path)
+                self.assertEqual(self.compile(changed, cache, workers), self.compile(changed),
+                                 'Types from cache should give the same code')
+                self.assertEqual(cache.hits, 15, 'All declarations but main should be reused')
+
+    def test_changed_dependency(self):
+        cache = InterfaceCache()
+        self.compile(program, cache)
+        cache = InterfaceCache(cache.used)
+        changed = program.replace('id(x) { return x; }', 'id(x) { return x : []; }')
+        self.assertEqual(self.compile(changed, cache), self.compile(changed))
+        self.assertEqual(cache.hits, 2, 'Only g and even and odd do not use id')
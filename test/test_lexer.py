@@ -1,5 +1,11 @@
+import contextlib
+import io
+import os
+import random
+import tempfile
 import unittest
-from compiler.lexer import Lexer, TokenType, Token
+from compiler.lexer import EditedTokens, Lexer, TokenType, Token
+from compiler.utils import InputHandler
 
 
 # TODO More tests
@@ -95,5 +101,101 @@ class LexerTests(unittest.TestCase):
         self.expected_token(tokens[3], TokenType.CHAR, '\n')
         self.expected_token(tokens[4], TokenType.CHAR, '\t')
 
+    def test_lex_positions(self):
+        InputHandler.set_input_text('a /* x\n yz */ bb\n  // c\n 12')
+        tokens = Lexer().lex_input()
+        self.expected_token_len(tokens, 4)
+        positions = [(t.code_range.start.line, t.code_range.start.column, t.code_range.end.column) for t in tokens]
+        self.assertEqual(positions, [(1, 1, 2), (2, 8, 10), (4, 2, 4), (4, 4, 5)])
+
+    def test_iter_tokens_lazy(self):
+        self.lexer.input_text = 'a b # c'
+        tokens = self.lexer.iter_tokens()
+        self.expected_token(next(tokens), TokenType.IDENTIFIER, 'a')
+        self.assertEqual(self.lexer.lex_index, 1, 'Only the first token should be lexed')
+        self.expected_token(next(tokens), TokenType.IDENTIFIER, 'b')
+        self.assertEqual(len(self.lexer.lex_errors), 0)
+        self.expected_token(next(tokens), TokenType.UNEXPECTED, '#')
+        self.assertEqual(len(self.lexer.lex_errors), 1, 'Lex error should be recorded when it is found')
+
+    def test_parse_stops_at_lex_error(self):
+        from compiler.parser import Parser, TokenReader
+        self.lexer.input_text = 'main() {\n var x = 1 # 2;\n}\n var y = $;\n'
+        parser = Parser(reader := TokenReader(self.lexer.iter_tokens()))
+        with contextlib.redirect_stdout(out := io.StringIO()):
+            parser.parse_spl()
+        self.assertTrue(reader.lex_error)
+        self.assertEqual(out.getvalue(), '', 'Parse errors after a lex error should not be printed')
+        self.assertEqual(len(self.lexer.lex_errors), 1, 'The rest of the input is lexed after parsing')
+
+    def test_lex_long_comment_blocks(self):
+        lines = 100000
+        self.lexer.input_text = '1\n' + '// comment\n' * lines + '\n' * lines + '/*' + ' comment\n' * lines + '*/ 2'
+        tokens = self.lexer.lex_input()
+        self.expected_token_len(tokens, 3)
+        self.expected_token(tokens[0], TokenType.INT, '1')
+        self.expected_token(tokens[1], TokenType.INT, '2')
+
+    def test_lex_long_comment_block_position(self):
+        InputHandler.set_input_text('// comment\n' * 100000 + '  x')
+        tokens = Lexer().lex_input()
+        self.expected_token(tokens[0], TokenType.IDENTIFIER, 'x')
+        self.assertEqual(tokens[0].code_range.start.line, 100001)
+        self.assertEqual(tokens[0].code_range.start.column, 3)
+
+    def test_lex_memory_mapped_file(self):
+        text = "main() {\n    print('a', \"bc\"); # \n}"
+        InputHandler.set_input_text(text)
+        expected = [(t.token_type, t.value, t.start, t.end) for t in Lexer().lex_input()]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'input.spl')
+            with open(path, 'w') as f:
+                f.write(text)
+            InputHandler.set_input_file(path)
+            tokens = Lexer().lex_input()
+            self.assertEqual([(t.token_type, t.value, t.start, t.end) for t in tokens], expected)
+            self.expected_token(tokens[-3], TokenType.UNEXPECTED, '#')
+            self.assertEqual(tokens[-3].code_range.start.line, 2)
+            self.assertEqual(InputHandler.get_line(2), "    print('a', \"bc\"); # ")
+            InputHandler.set_input_text('')
+
+    def test_relex_edits(self):
+        def lex_state(tokens):
+            return [(t.token_type, t.value, t.start, t.end) for t in tokens]
+
+        text = 'main() {\n    var ab = 1 : [];\n    print("x");\n    // comment\n    return ab;\n}'
+        InputHandler.set_input_text(text)
+        tokens = EditedTokens(Lexer().lex_input())
+        edits = [('ab', 0, 'c'),  # Extend an identifier
+                 (':', 0, ':'),  # Operator becomes ::
+                 ('"x"', 1, ''),  # Remove opening quote, closing quote becomes unexpected
+                 ('x"', 0, '"'),  # And add it again
+                 ('// comment', 0, '/*'),  # Start a multiline comment that runs to the end
+                 ('/*// comment', 2, ''),  # And remove it again
+                 ('main', 4, 'f'),
+                 ('}', 1, '} x')]
+        for find, removed, inserted in edits:
+            offset = text.index(find)
+            text = text[:offset] + inserted + text[offset + removed:]
+            InputHandler.set_input_text(text)
+            tokens = Lexer().relex(tokens, offset, removed, inserted)
+            self.assertEqual(lex_state(tokens), lex_state(Lexer().lex_input()), f'Relex mismatch for {text!r}')
+
+    def test_relex_many_edits(self):  # Tokens after the edits are only shifted when they are read
+        random.seed(1)
+        text = 'main() {\n    var ab = 1 : [];\n    print("x", \'c\');\n    /* comment */ return ab;\n}\n' * 20
+        InputHandler.set_input_text(text)
+        tokens = EditedTokens(Lexer().lex_input())
+        for i in range(300):
+            offset = random.randrange(len(text))
+            removed = random.choice([0, 0, 1, 3])
+            inserted = random.choice(['', 'x', ' ', '"', "'", '/*', '*/', '1;', '\n', 'var y = "a";'])
+            text = text[:offset] + inserted + text[offset + removed:]
+            InputHandler.set_input_text(text)
+            tokens = Lexer().relex(tokens, offset, removed, inserted)
+            if i % 7 == 0:
+                expected = [(t.token_type, t.value, t.start, t.end) for t in Lexer(len(text)).lex_input()]
+                self.assertEqual([(t.token_type, t.value, t.start, t.end) for t in tokens], expected)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,56 @@
+import contextlib
+import io
+import unittest
+
+from compiler.lexer import Lexer
+from compiler.parser import Parser, TokenReader
+from compiler.utils import InputHandler
+
+# Malformed programs and the diagnostics reported for them, as (error, line, column). The recovery points are those of
+# the parser that used exceptions for parse errors, so these are the diagnostics it reported
+malformed_programs = [
+    ('main() { var r = f(x,x x)); return r; }', '', [('ExpectedSymbolError', 1, 24)]),
+    ('main() { println( , abs(-796) ); println(1); }', '',
+     [('ExpectedTermError', 1, 19), ('MissingSemicolonError', 1, 31), ('ExpectedStatementError', 1, 31)]),
+    ('main() { print(b1 || ); print(2);\n print(3); }', '', [('ExpectedTermError', 1, 22)]),
+    ('main() { var x = -(1 2); var y = 1 + (2 3); return; }', '', [('UnbalancedBracketsError', 1, 19)]),
+    ('f(x) :: (Int, ) -> Int { return x; }\nmain() { return; }',
+     '### Error at\n2:19: main() { return; }\n' + ' ' * 24 + '^\n',
+     [('ExpectedTypeError', 1, 15), ('ExpectedTypeError', 2, 8), ('ExpectedSymbolError', 2, 10)]),
+    ('f(x y) { return x; }\nmain() { return (1, 2 3); }', '',
+     [('ExpectedSymbolError', 1, 5), ('UnbalancedBracketsError', 2, 17)]),
+]
+
+
+class ParserTests(unittest.TestCase):
+    @staticmethod
+    def parse(program: str):
+        InputHandler.set_input_text(program)
+        parser = Parser(TokenReader(Lexer().iter_tokens()))
+        with contextlib.redirect_stdout(out := io.StringIO()):
+            ast = parser.parse_spl()
+        errors = [(type(e).__name__, e.code_range.start.line, e.code_range.start.column) for e in parser.errors]
+        return ast, out.getvalue(), errors
+
+    def test_malformed_program_diagnostics(self):
+        for program, printed, expected in malformed_programs:
+            _, out, errors = self.parse(program)
+            self.assertEqual(errors, expected, program)
+            self.assertEqual(out, printed, program)
+
+    def test_pretty_print_with_errors(self):  # The AST is printed when there are parse errors
+        for program, _, _ in malformed_programs:
+            ast, _, _ = self.parse(program)
+            ast.pretty_print()
+        ast, _, _ = self.parse(malformed_programs[-1][0])
+        self.assertIn('f{Error!}', ast.pretty_print())
+
+    def test_pretty_print_string_escapes(self):  # Printed strings parse to the same value again
+        ast, _, _ = self.parse('main() { print("a\\x22b\\\\n\\tc\nd\\\\"); }')
+        value = ast.declarations[0].block.statements[0].expression.expressions[0].value
+        self.assertEqual(value, 'a"b\\n\tc\nd\\')
+        printed = ast.pretty_print()
+        reparsed, _, errors = self.parse(printed)
+        self.assertEqual(errors, [])
+        self.assertEqual(reparsed.declarations[0].block.statements[0].expression.expressions[0].value, value)
+        self.assertEqual(reparsed.pretty_print(), printed)
@@ -0,0 +1,81 @@
+import unittest
+
+from compiler.analysis.binding import BindingAnalysis, Context
+from compiler.analysis.passes import AnalysisPass, PassManager
+from compiler.analysis.structure import ReturnValueChecker
+from compiler.AST.spl_file import SPLFile
+from compiler.lexer import Lexer
+from compiler.parser import Parser, TokenReader
+from compiler.utils import InputHandler
+
+program = '''
+f(x) :: a -> a { var y = x; return y; }
+[b] l = 1 : [];
+g(x, y) { var z = x + y; if (z > 0) { var w = z; return w; } return z; }
+h(x) :: b -> b { var q = x; return q; }
+k() :: -> Int { return u; }
+main() { var r = g(1, 2); print(f(r)); while (r > 0) { r = r - 1; } }
+'''
+
+
+class RecordingPass(AnalysisPass):
+    def __init__(self, name, log, after=None):
+        self.name = name
+        self.after = after or []
+        self.log = log
+
+    def visit_decl(self, decl):
+        self.log.append((self.name, decl))
+
+
+class CountingPass(AnalysisPass):  # Counts the nodes it enters
+    name = 'counting'
+
+    def __init__(self):
+        self.nodes = 0
+
+    def enter_SPL(self, node):
+        self.nodes += 1
+
+
+def parse(text: str):
+    InputHandler.set_input_text(text)
+    return Parser(TokenReader(Lexer().iter_tokens())).parse_spl()
+
+
+class PassManagerTests(unittest.TestCase):
+    def test_declared_order(self):
+        log = []
+        passes = [RecordingPass('b', log, after=['a']), RecordingPass('a', log), RecordingPass('c', log, after=['x'])]
+        manager = PassManager(passes)
+        self.assertEqual([p.name for p in manager.passes], ['a', 'b', 'c'], 'Pass should run after the named passes')
+        manager.run(SPLFile([1, 2]))
+        self.assertEqual(log, [('a', 1), ('b', 1), ('c', 1), ('a', 2), ('b', 2), ('c', 2)],
+                         'Each declaration should be handled by all passes before the next one')
+        self.assertEqual(set(manager.timings), {'a', 'b', 'c'}, 'Every pass should be timed')
+
+    def test_cyclic_order(self):
+        with self.assertRaises(Exception):
+            PassManager([RecordingPass('a', [], after=['b']), RecordingPass('b', [], after=['a'])])
+
+    def test_single_traversal(self):
+        def visits(*passes):
+            manager = PassManager(list(passes))
+            manager.run(parse(program))
+            return manager.visits
+
+        counting = CountingPass()
+        shared = visits(ReturnValueChecker(), BindingAnalysis(Context()), counting)
+        self.assertEqual(counting.nodes, shared, 'Every node should be visited once')
+        self.assertEqual(visits(ReturnValueChecker()) + visits(BindingAnalysis(Context())), 2 * shared,
+                         'Passes run together should visit the nodes half as often as when run one by one')
+
+    def analyse(self, workers):
+        ast = parse(program)
+        rvc, binding = ReturnValueChecker(), BindingAnalysis(Context())
+        PassManager([rvc, binding]).run(ast, workers)
+        return ast.pretty_print(), len(rvc.errors), {k: len(v) for k, v in binding.feedback.items()}
+
+    def test_parallel(self):
+        self.assertEqual(self.analyse(3), self.analyse(1),
+                         'Analysing in worker processes should give the same ids and feedback')
@@ -0,0 +1,62 @@
+import unittest
+
+from compiler.analysis.scheduling import dependency_levels
+from compiler.code_generation.generic.builtin.IsEmpty import IsEmpty
+from compiler.code_generation.generic.builtin.Print import Print
+from compiler.errors import TypeMismatch
+from compiler.front_end import FrontEnd
+
+program = '''
+var g = 1;
+id(x) { return x; }
+''' + ''.join(f'''
+f{i}(x, xs) {{
+    var l = id(x) : xs;
+    if (isEmpty(xs)) {{ return (l, g + {i}); }}
+    return f{i}(x, xs.tl);
+}}
+''' for i in range(12)) + '''
+even(n) { if (n == 0) { return True; } return odd(n - 1); }
+odd(n) { if (n == 0) { return False; } return even(n - 1); }
+main() { print(f3(1, [])); print(even(4)); }
+'''
+
+
+class SchedulingTests(unittest.TestCase):
+    def test_levels(self):
+        edges = [[1], [0], [0, 3], [], [2, 3]]
+        self.assertEqual(dependency_levels(edges), [[[0, 1], [3]], [[2]], [[4]]],
+                         'Components should come after the components they depend on')
+        chain = [[i - 1] if i > 0 else [] for i in range(50000)]
+        self.assertEqual(len(dependency_levels(chain)), 50000)
+
+    @staticmethod
+    def infer(text, workers):
+        _, env = FrontEnd([Print(), IsEmpty()], workers).run(text)
+        return (env.n,
+                [(name, f.quantified_type_vars, str(f.usage)) for name, f in env.functions.items()],
+                [(num, str(t)) for num, t in env.variables.items()],
+                [str(t) for t in env.node_types.values()])
+
+    def test_parallel(self):
+        self.assertEqual(self.infer(program, 2), self.infer(program, 1),
+                         'Inference in worker processes should give the same environment')
+
+    def test_parallel_error(self):
+        text = program.replace('g + 3', 'g + True')
+        errors = []
+        for workers in [1, 2]:
+            with self.assertRaises(TypeMismatch) as cm:
+                self.infer(text, workers)
+            errors.append(str(cm.exception))
+        self.assertEqual(errors[0], errors[1], 'Errors should be reported as without workers')
+
+    def test_error_order(self):  # Errors are found in dependency order, not in source order
+        for text, line, column in [
+            ("main() { print(phi('c')); return; }\nphi(n) { return n + 1; }\n", 1, 20),  # At the argument
+            ("f() { var x = 1 + True; return g(); }\ng() { return 'c' && True; }\nmain() { print(f()); return; }\n",
+             2, 14)]:  # In g, which f uses
+            with self.assertRaises(TypeMismatch) as cm:
+                self.infer(text, 1)
+            start = cm.exception.code_range.start
+            self.assertEqual((start.line, start.column), (line, column), text)
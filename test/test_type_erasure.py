@@ -0,0 +1,41 @@
+import unittest
+
+from compiler.code_generation.SSM.SSMGenerator import SSMGenerator
+from compiler.code_generation.generic.GenericGenerator import GenericGenerator
+from compiler.code_generation.generic.builtin.Eq import Eq
+from compiler.code_generation.generic.builtin.IsEmpty import IsEmpty
+from compiler.code_generation.generic.builtin.Len import Len
+from compiler.code_generation.generic.builtin.Print import Print
+from compiler.code_generation.generic.builtin.RefEq import RefEq
+from compiler.front_end import FrontEnd
+
+program = '''
+length(xs) { if (isEmpty(xs)) { return 0; } return 1 + length(xs.tl); }
+wrap(x, ys) { return length(x : ys); }
+count(xs, y) { var n = 0; while (!isEmpty(xs)) { if (xs.hd == y) { n = n + 1; } xs = xs.tl; } return n; }
+half(p) { print(p.snd); return length(p.fst); }
+main() {
+    print(length(1 : [])); print(length('a' : [])); print(wrap(True, [])); print(wrap(1, []));
+    print(count(1 : [], 1)); print(count((1, 2) : [], (1, 2)));
+    print(half((1 : [], 'c'))); print(half((True : [], 'd'))); print(half((True : [], 5)));
+    print(len(1 : [])); print(len(True : []));
+}
+'''
+
+
+class TypeErasureTests(unittest.TestCase):
+    @staticmethod
+    def generate(share_instances):  # Names of the function instances of program and its SSM code
+        builtins = [Print(), IsEmpty(), Len(), Eq(), RefEq()]
+        ast, env = FrontEnd(builtins).run(program)
+        functions = GenericGenerator(ast, env, builtins, share_instances).generate()
+        names = [fun_inst.name for fun_inst, _ in functions]
+        return names, [str(op) for ops in SSMGenerator(functions).generate() for op in ops]
+
+    def test_shared_instances(self):
+        names, ssm = self.generate(True)
+        all_names, all_ssm = self.generate(False)
+        for name, count in [('length', 1), ('wrap', 1), ('len', 1), ('isEmpty', 1), ('half', 2), ('count', 2)]:
+            self.assertEqual(names.count(name), count, f'Instances of {name}')
+        self.assertEqual(all_names.count('length'), 3)
+        self.assertLess(len(ssm), len(all_ssm))
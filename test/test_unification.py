@@ -0,0 +1,69 @@
+import copy
+import pickle
+import unittest
+
+from compiler.analysis.unification import InferenceInt, InferenceChar, InferenceList, InferenceTuple, \
+    InferenceTypeVar, UnificationError, undo
+from compiler.analysis.typing import Env
+from compiler.errors import TypeMismatch, InvalidTypeError
+
+
+class UnificationTests(unittest.TestCase):
+    def test_bind_chain(self):
+        a, b, c = InferenceTypeVar(0), InferenceTypeVar(1), InferenceTypeVar(2)
+        a.unify(b)
+        b.unify(InferenceList(c))
+        c.unify(InferenceInt())
+        self.assertEqual(str(a), '[int]', 'Type variables should resolve to the type they were unified with')
+        self.assertIs(a.prune(), b.prune(), 'Unified variables should have the same representative')
+        with self.assertRaises(UnificationError):
+            InferenceList(InferenceChar()).unify(a)
+
+    def test_failed_unification_is_undone(self):
+        a, b = InferenceTypeVar(0), InferenceTypeVar(1)
+        t1 = InferenceTuple(a, InferenceList(b))
+        t2 = InferenceTuple(InferenceInt(), InferenceChar())
+        with self.assertRaises(TypeMismatch):
+            t1.unify_or_type_error(t2, None)
+        self.assertEqual(str(t1), '(v0, [v1])', 'Bindings of a failed unification should be undone')
+        with self.assertRaises(InvalidTypeError):
+            a.unify_or_type_error(InferenceList(a), None)
+        self.assertIsNone(a.instance)
+
+    def test_ground_types_are_interned(self):
+        t = InferenceTuple(InferenceList(InferenceInt()), InferenceChar())
+        self.assertIs(t, InferenceTuple(InferenceList(InferenceInt()), InferenceChar()))
+        self.assertIs(pickle.loads(pickle.dumps(t)), t, 'Unpickled types should be interned again')
+        self.assertIs(copy.deepcopy(t), t)
+        a = InferenceTypeVar(0)
+        self.assertIsNot(InferenceList(a), InferenceList(a), 'Types with type variables should not be interned')
+        a.unify(InferenceInt())
+        self.assertIs(InferenceTuple(InferenceList(a), InferenceChar()).resolve(), t)
+
+    def test_generalize_levels(self):
+        env = Env()
+        env.set_global_vars([0])
+        env.enter_level()
+        env.add_fun('f', [1, 2])
+        env.get_var(1).unify(InferenceList(env.get_var(0)))
+        self.assertEqual(env.generalize('f'), [env.get_var(2).num], 'Type variables free in a global should not be quantified')
+        env.enter_level()
+        env.add_fun('g', [3])
+        env.get_var(3).unify(env.functions['f'].usage.return_type)
+        self.assertEqual(env.generalize('g'), [], 'Type variables free in an earlier function should not be quantified')
+        self.assertEqual(env.level, 0)
+
+    def test_specialize(self):
+        env = Env()
+        env.enter_level()
+        env.add_fun('f', [0, 1])
+        x, xs, y = env.get_var(0), env.get_var(1), env.get_var(2)
+        xs.unify(InferenceList(x))
+        y.unify(x)
+        env.generalize('f')
+        trail = []
+        env.functions['f'].specialize([InferenceChar(), InferenceList(InferenceChar())], trail)
+        self.assertIs(InferenceTuple(y, xs).resolve(), InferenceTuple(InferenceChar(), InferenceList(InferenceChar())))
+        undo(trail)
+        self.assertEqual(str(InferenceTuple(y, xs)), f'(v{x.num}, [v{x.num}])',
+                         'The function type should be restored by the trail')